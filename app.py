@@ -1,20 +1,25 @@
 import streamlit as st
 import pandas as pd
 import os
-from datetime import datetime
-from reportlab.lib import colors
-from reportlab.lib.pagesizes import A4
-from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer, Image
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.pdfbase import pdfmetrics
-from reportlab.pdfbase.ttfonts import TTFont
-from reportlab.lib.units import mm
-from reportlab.lib.utils import ImageReader
-from io import BytesIO
+import time
+import uuid
+from datetime import datetime, date
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+from functools import partial, wraps
+from compliance import with_status, STATUS_COLUMN
+from limits import zs_dop, fill_zs_dop
+from meter_import import import_measurements
+from resources import sidebar_logo, font_available, PRIMARY_COLOR
+from payload import payload_hash, meta_hash, protocol_filename, filename_part
+from store import get_store, LazyTables
+from schema import conform, editable, frame_bytes
+from trend import readings, compare, summary, trend_payload, STATUS_WORSE, STATUS_NEW, STATUS_GONE
+import profiling
+# ReportLab (pdf_engine, fragments, jobs) ładowany dopiero w etapie 5 - zob. get_queue()
 
 # --- KONFIGURACJA ---
 st.set_page_config(page_title="FARAD - System Protokołów", page_icon="⚡", layout="wide")
-PRIMARY_COLOR = "#003366"
 
 # CSS - Wąski sidebar i style
 st.markdown(f"""
@@ -62,304 +67,336 @@ st.markdown(f"""
     </style>
     """, unsafe_allow_html=True)
 
-# --- OBSŁUGA CZCIONEK OFFLINE ---
-HAS_POLISH_FONT = False
-
-def register_fonts_offline():
-    global HAS_POLISH_FONT
-    font_name = "font.ttf"
-    if os.path.exists(font_name):
+# --- CACHE PDF (per sesja) ---
+# Sesja pamięta tylko ścieżki plików z katalogu roboczego kolejki (jobs.SPOOL_DIR);
+# bajty PDF czytane są dopiero po kliknięciu "Pobierz".
+PDF_CACHE_SIZE = 8
+
+def get_pdf_cache():
+    if 'pdf_cache' not in st.session_state:
+        st.session_state.pdf_cache = OrderedDict()
+    return st.session_state.pdf_cache
+
+def cached_pdf(key):
+    cache = get_pdf_cache()
+    if key in cache:
+        if not os.path.exists(cache[key]):   # plik usunięty po SPOOL_TTL
+            del cache[key]
+            return None
+        cache.move_to_end(key)
+        return cache[key]
+    return None
+
+def cache_pdf(key, path):
+    cache = get_pdf_cache()
+    cache[key] = path
+    cache.move_to_end(key)
+    while len(cache) > PDF_CACHE_SIZE:
+        cache.popitem(last=False)
+
+def read_file(path):
+    with open(path, 'rb') as fh:
+        return fh.read()
+
+# --- GENEROWANIE W TLE (jobs.py) ---
+JOB_POLL_SECONDS = 1
+
+def get_queue():
+    from jobs import get_queue as queue
+    return queue()
+
+@st.fragment(run_every=JOB_POLL_SECONDS)
+def job_progress(state_key, label):
+    # Odpytuje tylko ten fragment; zakończone zlecenie trafia do st.session_state[f"{state_key}_done"]
+    # (albo `_error`) i pełny przebieg pokazuje wynik. Wywoływany tylko, gdy zlecenie trwa -
+    # bezczynna sesja nie przebiega co sekundę
+    key = st.session_state.get(state_key)
+    if key is None:
+        return
+    job = get_queue().get(key)
+    if job is not None and not job.ready:
+        st.progress(job.progress, text=f"{label}... {time.time() - job.submitted:.0f} s")
+        return
+    del st.session_state[state_key]
+    if job is None:
+        st.session_state[f"{state_key}_error"] = "Zlecenie wygasło - uruchom je ponownie."
+    elif job.error:
+        st.session_state[f"{state_key}_error"] = job.error
+    else:
+        st.session_state[f"{state_key}_done"] = job
+    st.rerun()
+
+# --- EKSPORT ZBIORCZY (ZIP) ---
+EXPORT_LIMIT = 500   # protokołów na liście wyboru
+
+def export_filename(found):
+    # Wspólny obiekt -> Protokoly_<obiekt>.zip; mieszany wybór -> Protokoly.zip
+    objects = {filename_part(o) for o in found.obiekt}
+    return f"Protokoly_{objects.pop()}.zip" if len(objects) == 1 and '' not in objects else "Protokoly.zip"
+
+def export_section():
+    st.caption("Wybrane protokoły z archiwum w jednym pliku ZIP - np. wszystkie dla jednego obiektu.")
+    query = st.text_input("Szukaj w archiwum", "", placeholder="nr, klient, obiekt, data", key="export_query")
+    found = get_store().search(query, limit=EXPORT_LIMIT)
+    if found.empty:
+        st.info("Brak protokołów w archiwum.")
+        return
+    labels = {r.id: f"{r.nr_protokolu or '#' + str(r.id)} | {r.obiekt} | {r.data}" for r in found.itertuples()}
+    picked = st.multiselect("Protokoły", list(labels), default=list(labels), format_func=labels.get)
+    if st.button("📦 Generuj ZIP", disabled=not picked):
+        stamps = dict(zip(found.id, found.zmieniono))
+        job = get_queue().submit_export(get_store(), [(i, stamps[i]) for i in picked])
+        st.session_state.zip_job = job.key
+        st.session_state.zip_name = export_filename(found[found.id.isin(picked)])
+        st.session_state.pop('zip_export', None)
+    if 'zip_job_error' in st.session_state:
+        st.error(f"Błąd: {st.session_state.pop('zip_job_error')}")
+    if 'zip_job' in st.session_state:
+        job_progress('zip_job', "Eksport protokołów")
+
+    job = st.session_state.get('zip_export')
+    if job is None or not os.path.exists(job.result):
+        return
+    for name, error in job.skipped:
+        st.warning(f"Pominięto {name}: {error}")
+    st.download_button(f"⬇️ POBIERZ ZIP ({job.total - len(job.skipped)} PDF, {job.size / 1024:.0f} KB)",
+                       partial(read_file, job.result), st.session_state.zip_name, "application/zip", type="primary")
+
+# --- PORÓWNANIE Z POPRZEDNIM BADANIEM (trend.py) ---
+def previous_comparison():
+    # (poprzedni protokół, wynik trend.compare) albo None. Odczyty poprzedniego protokołu czytane
+    # z archiwum raz na sesję (do jego zmiany); porównanie liczone kolumnowo przy każdym przebiegu
+    obiekt = str(st.session_state.get('obiekt') or '').strip()
+    if not obiekt:
+        return None
+    store = get_store()
+    found = store.previous_protocols(obiekt, exclude=st.session_state.get('protocol_id'), before=str(st.session_state.get('data') or ''))
+    if found.empty:
+        return None
+    prev = found.iloc[0]
+    key = (int(prev.id), prev.zmieniono)
+    cached = st.session_state.get('trend_history')
+    if cached is None or cached[0] != key:
+        cached = st.session_state.trend_history = (key, store.readings([prev.id]))
+    return prev, compare(readings(st.session_state.tables), cached[1])
+
+def comparison_section(comparison):
+    with st.expander("📈 Porównanie z poprzednim badaniem"):
+        if comparison is None:
+            st.caption("Brak wcześniejszego protokołu tego obiektu w archiwum.")
+            return
+        prev, result = comparison
+        counts = summary(result)
+        st.caption(f"Protokół {prev.nr_protokolu or '#' + str(prev.id)} z {prev.data}: porównano {counts['porownano']} obwodów, "
+                   f"pogorszenie: {counts[STATUS_WORSE]}, nowe: {counts[STATUS_NEW]}, nieobecne obecnie: {counts[STATUS_GONE]}.")
+        worse = result[result['Status'] == STATUS_WORSE]
+        if not worse.empty:
+            st.dataframe(worse.drop(columns=['Status']), hide_index=True)
+        st.checkbox("Dołącz porównanie do PDF", key='trend_pdf')
+
+# --- DIAGNOSTYKA (FARAD_PROFILE=1, zob. profiling.py) ---
+DIAG_HISTORY = 20
+SESSION_KEEP = ('pdf_cache', 'diag_traces', 'diag_session')   # przeżywają "Nowy protokół"
+
+@contextmanager
+def session_trace(name):
+    # Ślad przebiegu - do logu JSON i do historii sesji pokazywanej w panelu diagnostyki
+    session = st.session_state.setdefault('diag_session', uuid.uuid4().hex[:8]) if profiling.ENABLED else None
+    with profiling.trace(name, session=session) as t:
+        try:
+            yield t
+        finally:
+            if t is not None:
+                # Pamięć tabel w logu JSON - zsumowana po sesjach pokazuje, co zajmuje serwer
+                t.fields['tables_kb'] = round(sum(b for _, b in session_memory().values()) / 1024, 1)
+                st.session_state.setdefault('diag_traces', deque(maxlen=DIAG_HISTORY)).append(t)
+
+def session_memory():
+    # {tabela: (wiersze, bajty)} - deep, ale w schemacie schema.SCHEMA bez przechodzenia po obiektach;
+    # tabele z archiwum liczone tylko, gdy już wczytane
+    tables = st.session_state.get('tables') or {}
+    loaded = tables.loaded() if isinstance(tables, LazyTables) else tables
+    return {name: (len(df), frame_bytes(df)) for name, df in loaded.items()}
+
+def traced(func):
+    # Fragment przebiegający samodzielnie dostaje własny ślad; w pełnym przebiegu - odcinek
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        with session_trace(func.__name__):
+            return func(*args, **kwargs)
+    return wrapper
+
+def diagnostics_sidebar():
+    traces = st.session_state.get('diag_traces')
+    if not profiling.ENABLED or not traces:
+        return
+    with st.sidebar.expander("🩺 Diagnostyka"):
+        st.caption(f"Sesja {st.session_state.diag_session}")
+        st.dataframe(pd.DataFrame([{
+            'przebieg': t.fields.get('step') or t.name, 'ms': t.duration_ms,
+            'wiersze': t.counters.get('pdf.rows', 0), 'KB': round(t.counters.get('pdf.bytes', 0) / 1024, 1),
+        } for t in reversed(traces)]), hide_index=True)
+        last = traces[-1]
+        st.caption(f"Ostatni: {last.fields.get('step') or last.name}")
+        st.dataframe(pd.DataFrame([{'odcinek': '  ' * d + n, 'ms': ms} for n, d, ms in last.spans]), hide_index=True)
+        memory = session_memory()
+        st.caption(f"Pamięć tabel sesji: {sum(b for _, b in memory.values()) / 1024:.1f} KB")
+        st.dataframe(pd.DataFrame([{'tabela': name, 'wiersze': rows, 'KB': round(b / 1024, 1)}
+                                   for name, (rows, b) in memory.items()]), hide_index=True)
+
+# --- STAN SESJI <-> DANE PROTOKOŁU ---
+UKLADY = ["TN-C-S", "TN-S", "TN-C", "TT", "IT"]
+OCENY = ["POZYTYWNY", "NEGATYWNY", "ND"]
+ORZECZENIA = ["INSTALACJA NADAJE SIĘ DO EKSPLOATACJI", "INSTALACJA NIE NADAJE SIĘ DO EKSPLOATACJI"]
+
+# (sekcja, pole w `data`, klucz w session_state, wartość domyślna)
+SESSION_FIELDS = [
+    ('meta', 'klient', 'klient', ''), ('meta', 'obiekt', 'obiekt', ''), ('meta', 'data', 'data', ''),
+    ('meta', 'wykonawca', 'wykonawca', ''), ('meta', 'nr_uprawnien', 'nr_uprawnien', ''),
+    ('meta', 'nr_protokolu', 'nr_protokolu', ''), ('meta', 'orzeczenie', 'orzeczenie', ''),
+    ('device', 'nazwa', 'dev_nazwa', ''), ('device', 'producent', 'dev_prod', ''),
+    ('device', 'typ', 'dev_typ', ''), ('device', 'nr_seryjny', 'dev_sn', ''),
+    ('supply', 'uklad', 'sup_uklad', 'TN-C-S'), ('supply', 'napiecie', 'sup_nap', 230),
+    ('supply', 'czestotliwosc', 'sup_freq', 50), ('supply', 'ipf', 'sup_ipf', ''),
+    ('supply', 'zab_typ', 'sup_zab_typ', ''), ('supply', 'zab_prad', 'sup_zab_prad', ''),
+    ('supply', 'uziom_typ', 'sup_uziom_typ', ''), ('supply', 'ra', 'sup_ra', ''),
+    ('supply', 'ze', 'sup_ze', ''), ('supply', 'przewod_pe', 'sup_pe', ''),
+    ('supply', 'wyl_glowny', 'sup_main_sw', ''),
+    ('supply', 'bond_woda', 'bond_woda', False), ('supply', 'bond_gaz', 'bond_gaz', False),
+    ('supply', 'bond_konstr', 'bond_konstr', False), ('supply', 'bond_co', 'bond_co', False),
+]
+
+# Wartości domyślne formularza zasilania (etap 2)
+SUPPLY_DEFAULTS = {
+    'sup_uklad': UKLADY[0], 'sup_nap': 230, 'sup_freq': 50, 'sup_ipf': "6.0",
+    'sup_zab_typ': "gG", 'sup_zab_prad': 63, 'sup_main_sw': "FR 100A 3P",
+    'sup_uziom_typ': "Fundamentowy", 'sup_ra': "2.5", 'sup_ze': "0.22", 'sup_pe': "LgY 16mm2",
+    'bond_woda': True, 'bond_gaz': True, 'bond_konstr': False, 'bond_co': True,
+}
+
+INSPECTION_ITEMS = [
+    "Ochrona podstawowa (izolacja/obudowy)", "Ochrona przy uszkodzeniu (SWZ)", 
+    "Dobór przewodów do obciążalności", "Dobór i nastawy zabezpieczeń",
+    "Obecność schematów i oznaczeń", "Ciągłość przewodów ochronnych",
+    "Dostęp do urządzeń", "Stan osprzętu łączeniowego"
+]
+UWAGI_DEFAULT = "Instalacja wykonana zgodnie z normami."
+
+def widget_value(key):
+    # Wartość dla widżetu etapu 2. Protokół zapisany przed pierwszym otwarciem etapu 2 ma w polach
+    # liczbowych '' (domyślne z SESSION_FIELDS) - number_input przyjmuje tylko liczbę
+    default = SUPPLY_DEFAULTS[key]
+    value = st.session_state.get(key, default)
+    if isinstance(default, int) and not isinstance(default, bool):
         try:
-            pdfmetrics.registerFont(TTFont('CustomFont', font_name))
-            pdfmetrics.registerFont(TTFont('CustomFont-Bold', font_name)) 
-            HAS_POLISH_FONT = True
-            return 'CustomFont'
-        except:
+            return int(value)
+        except (TypeError, ValueError):
+            return default
+    return value
+
+def option_index(options, value):
+    return options.index(value) if value in options else 0
+
+def build_payload():
+    data = {'meta': {}, 'device': {}, 'supply': {}}
+    for section, field, key, default in SESSION_FIELDS:
+        data[section][field] = st.session_state.get(key, default)
+    data['inspekcja'] = st.session_state.get('inspekcja', {})
+    data['tables'] = st.session_state.tables
+    data['column_names'] = st.session_state.column_names
+    data['uwagi'] = st.session_state.get('uwagi', '')
+    return data
+
+def restore_session(data):
+    for section, field, key, default in SESSION_FIELDS:
+        if field in data.get(section, {}):
+            st.session_state[key] = data[section][field]
+    if st.session_state.get('data'):
+        try:
+            st.session_state.data = date.fromisoformat(str(st.session_state.data))
+        except ValueError:
             pass
-    HAS_POLISH_FONT = False
-    return 'Helvetica'
-
-FONT_NAME = register_fonts_offline()
-FONT_NAME_BOLD = 'CustomFont-Bold' if HAS_POLISH_FONT else 'Helvetica-Bold'
-
-def clean_text(text):
-    if HAS_POLISH_FONT: return str(text)
-    replacements = {
-        'ą': 'a', 'ć': 'c', 'ę': 'e', 'ł': 'l', 'ń': 'n', 'ó': 'o', 'ś': 's', 'ź': 'z', 'ż': 'z',
-        'Ą': 'A', 'Ć': 'C', 'Ę': 'E', 'Ł': 'L', 'Ń': 'N', 'Ó': 'O', 'Ś': 'S', 'Ź': 'Z', 'Ż': 'Z'
-    }
-    text = str(text)
-    for k, v in replacements.items(): text = text.replace(k, v)
-    return text
-
-# --- GENERATOR PDF ---
-class EICR_PDF:
-    def __init__(self, buffer, data):
-        self.buffer = buffer
-        self.data = data
-        self.doc = SimpleDocTemplate(
-            self.buffer, pagesize=A4, 
-            rightMargin=10*mm, leftMargin=10*mm, topMargin=10*mm, bottomMargin=10*mm
-        )
-        self.styles = getSampleStyleSheet()
-        self._create_custom_styles()
-
-    def _create_custom_styles(self):
-        # 1. Nagłówek Główny
-        self.style_header = ParagraphStyle(
-            'FaradHeader', parent=self.styles['Heading1'], fontName=FONT_NAME_BOLD, 
-            fontSize=14, textColor=colors.HexColor(PRIMARY_COLOR), spaceAfter=5
-        )
-        # 2. Podtytuły sekcji (Biały tekst na granatowym tle)
-        self.style_subheader = ParagraphStyle(
-            'FaradSub', parent=self.styles['Heading2'], fontName=FONT_NAME_BOLD, 
-            fontSize=10, textColor=colors.white, backColor=colors.HexColor(PRIMARY_COLOR),
-            leading=14, spaceBefore=6, spaceAfter=0, borderPadding=2
-        )
-        # 3. Etykiety w tabelach (Bold)
-        self.style_label = ParagraphStyle(
-            'FaradLabel', parent=self.styles['Normal'], fontName=FONT_NAME_BOLD, fontSize=8, leading=10
-        )
-        # 4. Wartości w tabelach
-        self.style_value = ParagraphStyle(
-            'FaradValue', parent=self.styles['Normal'], fontName=FONT_NAME, fontSize=8, leading=10
-        )
-        # 5. Mały tekst (np. listy kontrolne)
-        self.style_small = ParagraphStyle(
-            'FaradSmall', parent=self.styles['Normal'], fontName=FONT_NAME, fontSize=7, leading=9
-        )
-        # 6. Normalny tekst (Przywrócony - naprawia błąd)
-        self.style_normal = ParagraphStyle(
-            'FaradNormal', parent=self.styles['Normal'], fontName=FONT_NAME, fontSize=9, leading=11
-        )
-
-    def generate(self):
-        elements = []
-
-        # 1. LOGO I NAGŁÓWEK
-        logo_path = "logo.png"
-        logo_img = clean_text("[BRAK LOGO]")
-        if os.path.exists(logo_path):
-            try:
-                utils_img = ImageReader(logo_path)
-                iw, ih = utils_img.getSize()
-                aspect = ih / float(iw)
-                target_width = 40*mm
-                logo_img = Image(logo_path, width=target_width, height=target_width * aspect)
-            except: pass
-
-        t_head = Table([[logo_img, Paragraph(f"<b>{clean_text('PROTOKÓŁ BADAŃ INSTALACJI ELEKTRYCZNEJ')}</b><br/>{clean_text('zgodny z PN-HD 60364-6')}", self.style_header)]], colWidths=[50*mm, 140*mm])
-        t_head.setStyle(TableStyle([('VALIGN', (0,0), (-1,-1), 'MIDDLE'), ('ALIGN', (1,0), (1,0), 'RIGHT')]))
-        elements.append(t_head)
-        elements.append(Spacer(1, 2*mm))
-
-        # 2. DANE ZLECENIA
-        meta = self.data['meta']
-        info_data = [
-            [Paragraph(f"<b>{clean_text('ZLECENIODAWCA:')}</b>", self.style_label), Paragraph(clean_text(meta['klient']), self.style_value),
-             Paragraph(f"<b>{clean_text('OBIEKT:')}</b>", self.style_label), Paragraph(clean_text(meta['obiekt']), self.style_value)],
-            [Paragraph(f"<b>{clean_text('DATA BADANIA:')}</b>", self.style_label), Paragraph(str(meta['data']), self.style_value),
-             Paragraph(f"<b>{clean_text('PROTOKÓŁ NR:')}</b>", self.style_label), Paragraph(clean_text(meta['nr_protokolu']), self.style_value)]
-        ]
-        t_info = Table(info_data, colWidths=[30*mm, 65*mm, 30*mm, 65*mm])
-        t_info.setStyle(TableStyle([
-            ('GRID', (0,0), (-1,-1), 0.5, colors.grey),
-            ('BACKGROUND', (0,0), (0,-1), colors.HexColor("#f0f0f0")),
-            ('BACKGROUND', (2,0), (2,-1), colors.HexColor("#f0f0f0")),
-            ('VALIGN', (0,0), (-1,-1), 'MIDDLE'),
-        ]))
-        elements.append(t_info)
-        elements.append(Spacer(1, 2*mm))
-
-        # 3. PRZYRZĄD POMIAROWY
-        dev = self.data['device']
-        meter_text = f"<b>Użyty przyrząd:</b> {clean_text(dev['nazwa'])} | <b>Producent:</b> {clean_text(dev['producent'])} | <b>Typ:</b> {clean_text(dev['typ'])} | <b>Nr seryjny:</b> {clean_text(dev['nr_seryjny'])}"
-        
-        t_meter = Table([[Paragraph(meter_text, self.style_small)]], colWidths=[190*mm])
-        t_meter.setStyle(TableStyle([
-            ('BOX', (0,0), (-1,-1), 0.5, colors.HexColor(PRIMARY_COLOR)),
-            ('BACKGROUND', (0,0), (-1,-1), colors.HexColor("#e6efff")), 
-            ('ALIGN', (0,0), (-1,-1), 'LEFT'),
-            ('LEFTPADDING', (0,0), (-1,-1), 6),
-        ]))
-        elements.append(t_meter)
-        elements.append(Spacer(1, 3*mm))
-
-        # 4. ZASILANIE I UZIEMIENIE (GRID LAYOUT)
-        elements.append(Paragraph(clean_text("I. CHARAKTERYSTYKA ZASILANIA (PN-HD 60364)"), self.style_subheader))
-        supply = self.data['supply']
-        
-        def cell_L(txt): return Paragraph(f"<b>{clean_text(txt)}</b>", self.style_label)
-        def cell_V(txt): return Paragraph(clean_text(txt), self.style_value)
-
-        supply_data = [
-            [cell_L("Układ sieci"), cell_V(supply['uklad']), cell_L("Napięcie"), cell_V(f"{supply['napiecie']} V")],
-            [cell_L("Uziom"), cell_V(supply['uziom_typ']), cell_L("Częstotliwość"), cell_V(f"{supply['czestotliwosc']} Hz")],
-            [cell_L("Rez. Uziomu RA"), cell_V(f"{supply['ra']} Ohm"), cell_L("Zab. Przedlicz."), cell_V(f"{supply['zab_typ']} {supply['zab_prad']}A")],
-            [cell_L("Impedancja Ze"), cell_V(f"{supply['ze']} Ohm"), cell_L("Spodziewany Ipf"), cell_V(f"{supply['ipf']} kA")],
-            [cell_L("Przewód PE"), cell_V(supply['przewod_pe']), cell_L("Wyłącznik Gł."), cell_V(supply['wyl_glowny'])]
-        ]
-        
-        t_supply = Table(supply_data, colWidths=[30*mm, 65*mm, 30*mm, 65*mm])
-        t_supply.setStyle(TableStyle([
-            ('GRID', (0,0), (-1,-1), 0.5, colors.grey),
-            ('BACKGROUND', (0,0), (0,-1), colors.whitesmoke), 
-            ('BACKGROUND', (2,0), (2,-1), colors.whitesmoke), 
-            ('VALIGN', (0,0), (-1,-1), 'MIDDLE'),
-        ]))
-        elements.append(t_supply)
-        
-        bonds = []
-        if supply['bond_woda']: bonds.append("Woda")
-        if supply['bond_gaz']: bonds.append("Gaz")
-        if supply['bond_konstr']: bonds.append("Konstr.")
-        if supply['bond_co']: bonds.append("C.O.")
-        bond_txt = "Brak" if not bonds else ", ".join(bonds)
-        
-        t_bond = Table([[cell_L("Połączenia wyrównawcze główne:"), cell_V(bond_txt)]], colWidths=[60*mm, 130*mm])
-        t_bond.setStyle(TableStyle([
-            ('BOX', (0,0), (-1,-1), 0.5, colors.grey),
-            ('BACKGROUND', (0,0), (0,0), colors.whitesmoke),
-            ('VALIGN', (0,0), (-1,-1), 'MIDDLE'),
-        ]))
-        elements.append(t_bond)
-        elements.append(Spacer(1, 4*mm))
-
-        # 5. OGLĘDZINY
-        elements.append(Paragraph(clean_text("II. WYNIKI OGLĘDZIN (PN-HD 60364-6 p. 6.4.2)"), self.style_subheader))
-        insp_df = self.data['inspekcja']
-        insp_items = list(insp_df.items())
-        half = (len(insp_items) + 1) // 2
-        col1_data = insp_items[:half]
-        col2_data = insp_items[half:]
-        
-        insp_rows = []
-        for i in range(len(col1_data)):
-            k1, v1 = col1_data[i]
-            res1 = "POZYTYWNY" if v1 == "POZYTYWNY" else ("NEGATYWNY" if v1 == "NEGATYWNY" else "N/D")
-            c1_txt = f"{clean_text(k1)}: <b>{clean_text(res1)}</b>"
-            
-            c2_txt = ""
-            if i < len(col2_data):
-                k2, v2 = col2_data[i]
-                res2 = "POZYTYWNY" if v2 == "POZYTYWNY" else ("NEGATYWNY" if v2 == "NEGATYWNY" else "N/D")
-                c2_txt = f"{clean_text(k2)}: <b>{clean_text(res2)}</b>"
-                
-            insp_rows.append([Paragraph(c1_txt, self.style_small), Paragraph(c2_txt, self.style_small)])
-
-        t_insp = Table(insp_rows, colWidths=[95*mm, 95*mm])
-        t_insp.setStyle(TableStyle([
-            ('GRID', (0,0), (-1,-1), 0.5, colors.lightgrey),
-            ('VALIGN', (0,0), (-1,-1), 'MIDDLE'),
-        ]))
-        elements.append(t_insp)
-        elements.append(Spacer(1, 4*mm))
-
-        # 6. TABELE POMIAROWE
-        custom_cols = self.data.get('column_names', {})
-        h_obwod = clean_text(custom_cols.get("Nazwa_Obwodu", "Obwód / Opis"))
-        h_przewody = clean_text("Przewody")
-        h_rodzaj = clean_text(custom_cols.get("Typ_Przewodu", "Typ"))
-        h_zab = clean_text("Zabezp.")
-        h_typ_zab = clean_text(custom_cols.get("Zab_Typ", "Typ"))
-        h_riso = clean_text(custom_cols.get("R_ISO", "R_ISO"))
-        h_imp = clean_text(custom_cols.get("Zs_pom", "Pętla (Zs)"))
-        h_ocena = clean_text("Ocena")
-
-        for table_name, df in self.data['tables'].items():
-            elements.append(Paragraph(clean_text(f"III. WYNIKI POMIARÓW: {table_name}"), self.style_subheader))
-            
-            table_data = [
-                [h_obwod, h_przewody, "", h_zab, "", h_riso, h_imp, "", "RCD", h_ocena],
-                ["", h_rodzaj, "mm2", h_typ_zab, "In", "M_Ohm", "Z_pom", "Z_dop", "ms", ""]
-            ]
-
-            for _, row in df.iterrows():
-                status = clean_text("POZ")
-                try:
-                    if float(row['Zs_pom']) > float(row['Zs_dop']): status = clean_text("NEG")
-                except: pass
-                
-                table_data.append([
-                    clean_text(row['Nazwa_Obwodu']),
-                    clean_text(row['Typ_Przewodu']),
-                    str(row['Przekroj']),
-                    clean_text(row['Zab_Typ']),
-                    str(row['Zab_In']),
-                    str(row['R_ISO']),
-                    str(row['Zs_pom']),
-                    str(row['Zs_dop']),
-                    str(row['RCD_t']),
-                    status
-                ])
-
-            col_widths = [48*mm, 15*mm, 10*mm, 14*mm, 11*mm, 18*mm, 18*mm, 18*mm, 15*mm, 23*mm]
-            t_meas = Table(table_data, colWidths=col_widths, repeatRows=2)
-            ts = TableStyle([
-                ('SPAN', (0,0), (0,1)), ('SPAN', (1,0), (2,0)), ('SPAN', (3,0), (4,0)),
-                ('SPAN', (5,0), (5,1)), ('SPAN', (6,0), (7,0)), ('SPAN', (8,0), (8,1)), ('SPAN', (9,0), (9,1)),
-                ('FONTNAME', (0,0), (-1,-1), FONT_NAME), 
-                ('FONTSIZE', (0,0), (-1,-1), 7),
-                ('FONTNAME', (0,0), (-1,1), FONT_NAME_BOLD),
-                ('BACKGROUND', (0,0), (-1,1), colors.HexColor(PRIMARY_COLOR)),
-                ('TEXTCOLOR', (0,0), (-1,1), colors.whitesmoke),
-                ('ALIGN', (0,0), (-1,-1), 'CENTER'), 
-                ('VALIGN', (0,0), (-1,-1), 'MIDDLE'),
-                ('ALIGN', (0,2), (0,-1), 'LEFT'),
-                ('GRID', (0,0), (-1,-1), 0.5, colors.grey),
-                ('LEFTPADDING', (0,0), (-1,-1), 2),
-                ('RIGHTPADDING', (0,0), (-1,-1), 2),
-            ])
-            t_meas.setStyle(ts)
-            elements.append(t_meas)
-            elements.append(Spacer(1, 5*mm))
-
-        # 7. STOPKA
-        elements.append(Spacer(1, 5*mm))
-        elements.append(Paragraph(f"<b>{clean_text('IV. UWAGI KOŃCOWE I ORZECZENIE')}</b>", self.style_header))
-        
-        orzeczenie = self.data['meta']['orzeczenie']
-        uwagi = self.data['uwagi']
-        
-        uwagi_style = TableStyle([
-            ('BOX', (0,0), (-1,-1), 0.5, colors.black),
-            ('BACKGROUND', (0,0), (-1,-1), colors.whitesmoke),
-            ('VALIGN', (0,0), (-1,-1), 'TOP'),
-        ])
-        
-        t_uwagi = Table([[Paragraph(f"<b>Orzeczenie: {clean_text(orzeczenie)}</b><br/><br/>Uwagi: {clean_text(uwagi)}", self.style_normal)]], colWidths=[190*mm])
-        t_uwagi.setStyle(uwagi_style)
-        elements.append(t_uwagi)
-        
-        elements.append(Spacer(1, 10*mm))
-        
-        footer_data = [[
-            Paragraph(f"Badanie wykonał:<br/><b>{clean_text(meta['wykonawca'])}</b>", self.style_normal),
-            Paragraph(f"Nr uprawnień:<br/><b>{clean_text(meta['nr_uprawnien'])}</b>", self.style_normal),
-            clean_text("Podpis: .............................")
-        ]]
-        t_foot = Table(footer_data, colWidths=[63*mm, 63*mm, 64*mm])
-        elements.append(t_foot)
-
-        self.doc.build(elements)
+    st.session_state.inspekcja = data.get('inspekcja', {})
+    if data.get('column_names'):
+        st.session_state.column_names = data['column_names']
+    st.session_state.uwagi = data.get('uwagi', '')
+
+# --- ARCHIWUM / AUTOZAPIS ---
+def reset_session():
+    for key in list(st.session_state.keys()):
+        if key not in SESSION_KEEP:
+            del st.session_state[key]
+
+def open_protocol(protocol_id):
+    data, tables = get_store().open(protocol_id)
+    reset_session()
+    restore_session(data)
+    st.session_state.tables = tables  # tabele wczytywane z Parquet dopiero przy pierwszym użyciu
+    st.session_state.protocol_id = protocol_id
+    init_state()
+    st.session_state.autosave_hashes = {'meta': meta_hash(build_payload()), 'tables': {}}
+
+def autosave_hash(data):
+    # Etapy 2, 3 i 5 przy pierwszym pokazaniu zapisują do stanu domyślne wartości swoich widżetów.
+    # Pola jeszcze niepokazane liczone są od razu z tymi wartościami - samo przejście przez menu
+    # nie jest zmianą protokołu
+    data = {**data, **{section: dict(data[section]) for section in ('meta', 'supply')}}
+    defaults = {**SUPPLY_DEFAULTS, 'orzeczenie': ORZECZENIA[0]}
+    for section, field, key, _ in SESSION_FIELDS:
+        if key in defaults and key not in st.session_state:
+            data[section][field] = defaults[key]
+    data['inspekcja'] = {**{item: OCENY[0] for item in INSPECTION_ITEMS}, **data['inspekcja']}
+    if 'uwagi' not in st.session_state:
+        data['uwagi'] = UWAGI_DEFAULT
+    return payload_hash(data)
+
+@profiling.span("autosave")
+def autosave():
+    # Zapis przyrostowy po każdym przebiegu; nowy protokół trafia do archiwum przy pierwszej zmianie
+    data = build_payload()
+    store = get_store()
+    if st.session_state.get('protocol_id') is None:
+        current = autosave_hash(data)
+        if st.session_state.setdefault('autosave_base', current) == current:
+            return
+        st.session_state.protocol_id = store.create()
+    st.session_state.autosave_hashes = store.save_protocol(st.session_state.protocol_id, data, st.session_state.get('autosave_hashes'))
+
+def archive_sidebar():
+    with st.sidebar.expander("📁 Archiwum"):
+        query = st.text_input("Szukaj", "", placeholder="nr, klient, obiekt, data")
+        found = get_store().search(query)
+        if not found.empty:
+            labels = {r.id: f"{r.nr_protokolu or '#' + str(r.id)} | {r.obiekt} | {r.data}" for r in found.itertuples()}
+            pick = st.selectbox("Protokół", list(labels), format_func=labels.get)
+            if st.button("Otwórz"):
+                open_protocol(pick)
+                st.rerun()
+        if st.button("Nowy protokół"):
+            reset_session()
+            st.rerun()
+        if st.session_state.get('protocol_id'):
+            st.caption(f"Autozapis: protokół #{st.session_state.protocol_id}")
 
 # --- UI ---
-def main():
-    if os.path.exists("logo.png"):
-        st.sidebar.image("logo.png", width=100)
-    
-    st.sidebar.title("FARAD v2.3")
-    if not HAS_POLISH_FONT:
-        st.sidebar.info("Wgraj 'font.ttf' dla polskich znaków.")
-
-    menu = st.sidebar.radio("Etapy:", ["1. Dane Zlecenia", "2. Zasilanie", "3. Oględziny", "4. Pomiary", "5. Generuj PDF"])
-
-    # Inicjalizacja stanu
+def import_table_name(name, tables):
+    # Nazwa zajęta przez istniejącą tabelę -> "Nazwa (2)", "Nazwa (3)"... - import nie nadpisuje
+    # tabel z obwodami wpisanymi ręcznie
+    base, n = name, 1
+    while name in tables:
+        n += 1
+        name = f"{base} ({n})"
+    return name
+
+def default_zs_dop(zab_typ, zab_in):
+    return float(zs_dop([zab_typ], [zab_in], widget_value('sup_nap'))[0])
+
+def init_state():
     if 'tables' not in st.session_state:
         st.session_state.tables = {
-            "Rozdzielnica Główna": pd.DataFrame([
-                {"Nazwa_Obwodu": "WLZ", "Typ_Przewodu": "YDY", "Przekroj": 10.0, "Zab_Typ": "gG", "Zab_In": 25, "R_ISO": 500, "Zs_pom": 0.22, "Zs_dop": 1.4, "RCD_t": 0}
-            ])
+            "Rozdzielnica Główna": conform(pd.DataFrame([
+                {"Nazwa_Obwodu": "WLZ", "Typ_Przewodu": "YDY", "Przekroj": 10.0, "Zab_Typ": "gG", "Zab_In": 25, "R_ISO": 500, "Zs_pom": 0.22, "Zs_dop": default_zs_dop("gG", 25), "RCD_t": 0}
+            ]))
         }
     
     if 'column_names' not in st.session_state:
@@ -368,66 +405,139 @@ def main():
             "R_ISO": "R_iso (MΩ)", "Zs_pom": "Zs pom (Ω)"
         }
 
+# --- FRAGMENTY ---
+# Widżety, których zmiana dotyczy tylko ich samych, przebiegają niezależnie (st.fragment):
+# edycja komórki wykonuje ponownie tylko funkcję edytora, a nie cały skrypt.
+# Przebieg fragmentu pomija koniec main(), więc fragment sam wywołuje autozapis.
+def try_autosave(in_fragment=False):
+    try:
+        autosave()
+    except Exception as e:
+        # st.sidebar nie jest dostępny z wnętrza fragmentu
+        (st.toast if in_fragment else st.sidebar.warning)(f"Autozapis nieudany: {e}")
+
+def fragment_autosave():
+    # Tylko gdy fragment przebiega sam - w pełnym przebiegu autozapis jest raz, na końcu main()
+    if not st.session_state.get('main_running'):
+        try_autosave(in_fragment=True)
+
+@st.fragment
+@traced
+def supply_form():
+    c1, c2 = st.columns(2)
+    with c1:
+        st.caption("Parametry Sieci")
+        st.session_state.sup_uklad = st.selectbox("Układ Sieci", UKLADY, index=option_index(UKLADY, widget_value('sup_uklad')))
+        st.session_state.sup_nap = st.number_input("Napięcie (V)", 230, 400, widget_value('sup_nap'))
+        st.session_state.sup_freq = st.number_input("Częstotliwość (Hz)", 50, 60, widget_value('sup_freq'))
+        st.session_state.sup_ipf = st.text_input("Ipf (kA)", widget_value('sup_ipf'))
+        st.caption("Zabezpieczenie Główne")
+        st.session_state.sup_zab_typ = st.text_input("Typ zab.", widget_value('sup_zab_typ'))
+        st.session_state.sup_zab_prad = st.number_input("Prąd (A)", 0, 1000, widget_value('sup_zab_prad'))
+        st.session_state.sup_main_sw = st.text_input("Wyłącznik Gł.", widget_value('sup_main_sw'))
+
+    with c2:
+        st.caption("Uziemienie")
+        st.session_state.sup_uziom_typ = st.text_input("Rodzaj uziomu", widget_value('sup_uziom_typ'))
+        st.session_state.sup_ra = st.text_input("Rezystancja RA (Ω)", widget_value('sup_ra'))
+        st.session_state.sup_ze = st.text_input("Impedancja Ze (Ω)", widget_value('sup_ze'))
+        st.session_state.sup_pe = st.text_input("Przewód PE (mm2)", widget_value('sup_pe'))
+        st.caption("Połączenia Wyrównawcze")
+        st.session_state.bond_woda = st.checkbox("Woda", widget_value('bond_woda'))
+        st.session_state.bond_gaz = st.checkbox("Gaz", widget_value('bond_gaz'))
+        st.session_state.bond_konstr = st.checkbox("Konstrukcja", widget_value('bond_konstr'))
+        st.session_state.bond_co = st.checkbox("C.O.", widget_value('bond_co'))
+    fragment_autosave()
+
+@st.fragment
+@traced
+def inspection_checklist():
+    saved = st.session_state.get('inspekcja', {})
+    st.session_state.inspekcja = {item: st.radio(item, OCENY, index=option_index(OCENY, saved.get(item)), horizontal=True, key=item) for item in INSPECTION_ITEMS}
+    fragment_autosave()
+
+@st.fragment
+@traced
+def measurement_editor(active_tab):
+    if st.button("Uzupełnij Zs_dop z tabel zabezpieczeń", help="Zs_dop = U0/Ia wg typu i prądu zabezpieczenia oraz napięcia zasilania"):
+        st.session_state.tables[active_tab] = conform(fill_zs_dop(st.session_state.tables[active_tab], widget_value('sup_nap')))
+        st.session_state.pop(f"editor_{active_tab}", None)  # edycje są już w tabeli - nie nakładaj ich ponownie
+    col_cfg = {
+        "Nazwa_Obwodu": st.column_config.TextColumn(st.session_state.column_names["Nazwa_Obwodu"], width="medium"),
+        # ZMIANA: Z SelectboxColumn na TextColumn
+        "Typ_Przewodu": st.column_config.TextColumn("Przewód", width="small"),
+        "Przekroj": st.column_config.NumberColumn("mm²", format="%.1f"),
+        "R_ISO": st.column_config.NumberColumn(st.session_state.column_names["R_ISO"], format="%d"),
+        "Zs_pom": st.column_config.NumberColumn(st.session_state.column_names["Zs_pom"], format="%.2f"),
+    }
+    
+    # ZMIANA: Przypisanie wyniku bezpośrednio do stanu, aby uniknąć problemu "podwójnego wpisywania"
+    # Kolumna "Ocena" wyliczana przez compliance.evaluate - tylko do odczytu, nie trafia do stanu
+    col_cfg[STATUS_COLUMN] = st.column_config.TextColumn("Ocena", width="small", disabled=True)
+    # Edytor dostaje kategorie jako tekst; wynik wraca do stanu w schemacie schema.SCHEMA
+    edited = st.data_editor(
+        editable(with_status(st.session_state.tables[active_tab])),
+        num_rows="dynamic",
+        column_config=col_cfg,
+        use_container_width=True,
+        key=f"editor_{active_tab}"
+    )
+    st.session_state.tables[active_tab] = conform(edited.drop(columns=[STATUS_COLUMN]))
+    
+    if len(st.session_state.tables) > 1 and st.button("Usuń tę tabelę"):
+        del st.session_state.tables[active_tab]
+        st.rerun()  # lista tabel jest poza fragmentem - pełny przebieg
+    fragment_autosave()
+
+def main():
+    logo = sidebar_logo()
+    if logo:
+        st.sidebar.image(logo, width=100)
+    
+    st.sidebar.title("FARAD v2.3")
+    if not font_available():
+        st.sidebar.info("Wgraj 'font.ttf' dla polskich znaków.")
+
+    menu = st.sidebar.radio("Etapy:", ["1. Dane Zlecenia", "2. Zasilanie", "3. Oględziny", "4. Pomiary", "5. Generuj PDF", "6. Eksport ZIP"])
+    profiling.annotate(step=menu)
+
+    # Inicjalizacja stanu
+    init_state()
+    archive_sidebar()
+    diagnostics_sidebar()
+
     # --- 1. DANE ---
     if menu == "1. Dane Zlecenia":
         st.header("Dane Podstawowe")
         col1, col2 = st.columns(2)
         with col1:
             st.subheader("Inwestor")
-            st.session_state.klient = st.text_input("Zleceniodawca", "Wspólnota Mieszkaniowa")
-            st.session_state.obiekt = st.text_input("Obiekt", "ul. Testowa 1")
-            st.session_state.data = st.date_input("Data", datetime.now())
+            st.session_state.klient = st.text_input("Zleceniodawca", st.session_state.get('klient', "Wspólnota Mieszkaniowa"))
+            st.session_state.obiekt = st.text_input("Obiekt", st.session_state.get('obiekt', "ul. Testowa 1"))
+            st.session_state.data = st.date_input("Data", st.session_state.get('data', datetime.now()))
         with col2:
             st.subheader("Wykonawca")
-            st.session_state.wykonawca = st.text_input("Wykonawca", "Jan Kowalski")
-            st.session_state.nr_uprawnien = st.text_input("Nr uprawnień", "E/123/2026")
-            st.session_state.nr_protokolu = st.text_input("Nr protokołu", "1/2026")
+            st.session_state.wykonawca = st.text_input("Wykonawca", st.session_state.get('wykonawca', "Jan Kowalski"))
+            st.session_state.nr_uprawnien = st.text_input("Nr uprawnień", st.session_state.get('nr_uprawnien', "E/123/2026"))
+            st.session_state.nr_protokolu = st.text_input("Nr protokołu", st.session_state.get('nr_protokolu', "1/2026"))
             
         st.divider()
         st.subheader("Użyty Przyrząd Pomiarowy")
         c3, c4, c5, c6 = st.columns(4)
-        st.session_state.dev_nazwa = c3.text_input("Nazwa przyrządu", "Miernik inst.")
-        st.session_state.dev_prod = c4.text_input("Producent", "Sonel")
-        st.session_state.dev_typ = c5.text_input("Typ", "MPI-540")
-        st.session_state.dev_sn = c6.text_input("Nr fabryczny", "AB123456")
+        st.session_state.dev_nazwa = c3.text_input("Nazwa przyrządu", st.session_state.get('dev_nazwa', "Miernik inst."))
+        st.session_state.dev_prod = c4.text_input("Producent", st.session_state.get('dev_prod', "Sonel"))
+        st.session_state.dev_typ = c5.text_input("Typ", st.session_state.get('dev_typ', "MPI-540"))
+        st.session_state.dev_sn = c6.text_input("Nr fabryczny", st.session_state.get('dev_sn', "AB123456"))
 
     # --- 2. ZASILANIE ---
     elif menu == "2. Zasilanie":
         st.header("Charakterystyka Zasilania")
-        c1, c2 = st.columns(2)
-        with c1:
-            st.caption("Parametry Sieci")
-            st.session_state.sup_uklad = st.selectbox("Układ Sieci", ["TN-C-S", "TN-S", "TN-C", "TT", "IT"])
-            st.session_state.sup_nap = st.number_input("Napięcie (V)", 230, 400, 230)
-            st.session_state.sup_freq = st.number_input("Częstotliwość (Hz)", 50, 60, 50)
-            st.session_state.sup_ipf = st.text_input("Ipf (kA)", "6.0")
-            st.caption("Zabezpieczenie Główne")
-            st.session_state.sup_zab_typ = st.text_input("Typ zab.", "gG")
-            st.session_state.sup_zab_prad = st.number_input("Prąd (A)", 0, 1000, 63)
-            st.session_state.sup_main_sw = st.text_input("Wyłącznik Gł.", "FR 100A 3P")
-
-        with c2:
-            st.caption("Uziemienie")
-            st.session_state.sup_uziom_typ = st.text_input("Rodzaj uziomu", "Fundamentowy")
-            st.session_state.sup_ra = st.text_input("Rezystancja RA (Ω)", "2.5")
-            st.session_state.sup_ze = st.text_input("Impedancja Ze (Ω)", "0.22")
-            st.session_state.sup_pe = st.text_input("Przewód PE (mm2)", "LgY 16mm2")
-            st.caption("Połączenia Wyrównawcze")
-            st.session_state.bond_woda = st.checkbox("Woda", True)
-            st.session_state.bond_gaz = st.checkbox("Gaz", True)
-            st.session_state.bond_konstr = st.checkbox("Konstrukcja", False)
-            st.session_state.bond_co = st.checkbox("C.O.", True)
+        supply_form()
 
     # --- 3. OGLĘDZINY ---
     elif menu == "3. Oględziny":
         st.header("Oględziny (PN-HD 60364-6)")
-        ck_list = [
-            "Ochrona podstawowa (izolacja/obudowy)", "Ochrona przy uszkodzeniu (SWZ)", 
-            "Dobór przewodów do obciążalności", "Dobór i nastawy zabezpieczeń",
-            "Obecność schematów i oznaczeń", "Ciągłość przewodów ochronnych",
-            "Dostęp do urządzeń", "Stan osprzętu łączeniowego"
-        ]
-        st.session_state.inspekcja = {item: st.radio(item, ["POZYTYWNY", "NEGATYWNY", "ND"], horizontal=True, key=item) for item in ck_list}
+        inspection_checklist()
 
     # --- 4. POMIARY ---
     elif menu == "4. Pomiary":
@@ -447,73 +557,89 @@ def main():
         new_tab = st.text_input("Nowa tabela (np. Garaż)", "")
         if st.button("Dodaj") and new_tab:
             if new_tab not in st.session_state.tables:
-                st.session_state.tables[new_tab] = pd.DataFrame([{"Nazwa_Obwodu": "Nowy", "Typ_Przewodu": "YDYp", "Przekroj": 1.5, "Zab_Typ": "B", "Zab_In": 16, "R_ISO": 999, "Zs_pom": 0.5, "Zs_dop": 2.8, "RCD_t": 0}])
+                st.session_state.tables[new_tab] = conform(pd.DataFrame([{"Nazwa_Obwodu": "Nowy", "Typ_Przewodu": "YDYp", "Przekroj": 1.5, "Zab_Typ": "B", "Zab_In": 16, "R_ISO": 999, "Zs_pom": 0.5, "Zs_dop": default_zs_dop("B", 16), "RCD_t": 0}]))
                 st.rerun()
 
+        # Import z miernika - jedna tabela na rozdzielnicę z pliku
+        with st.expander("Import z miernika (CSV/XML)", expanded='import_info' in st.session_state):
+            if 'import_info' in st.session_state:
+                st.success(st.session_state.pop('import_info'))
+            upload = st.file_uploader("Plik eksportu (np. Sonel MPI-540)", type=["csv", "txt", "xml"])
+            if upload is not None and st.button("Importuj"):
+                try:
+                    with st.spinner("Wczytywanie pomiarów..."):
+                        imported = import_measurements(upload.getvalue(), upload.name, widget_value('sup_nap'))
+                except Exception as e:
+                    st.error(f"Błąd importu: {e}")
+                else:
+                    renamed = []
+                    for name, df in imported.items():
+                        target = import_table_name(name, st.session_state.tables)
+                        if target != name:
+                            renamed.append(f"{name} → {target}")
+                        st.session_state.tables[target] = df
+                        st.session_state.pop(f"editor_{target}", None)
+                    info = f"Zaimportowano {sum(len(df) for df in imported.values())} obwodów w {len(imported)} tabelach."
+                    if renamed:
+                        info += f" Nazwy już zajęte, zapisano jako: {', '.join(renamed)}."
+                    st.session_state.import_info = info
+                    st.rerun()
+
         st.subheader(f"Edycja: {active_tab}")
-        col_cfg = {
-            "Nazwa_Obwodu": st.column_config.TextColumn(st.session_state.column_names["Nazwa_Obwodu"], width="medium"),
-            # ZMIANA: Z SelectboxColumn na TextColumn
-            "Typ_Przewodu": st.column_config.TextColumn("Przewód", width="small"),
-            "Przekroj": st.column_config.NumberColumn("mm²", format="%.1f"),
-            "R_ISO": st.column_config.NumberColumn(st.session_state.column_names["R_ISO"], format="%d"),
-            "Zs_pom": st.column_config.NumberColumn(st.session_state.column_names["Zs_pom"], format="%.2f"),
-        }
-        
-        # ZMIANA: Przypisanie wyniku bezpośrednio do stanu, aby uniknąć problemu "podwójnego wpisywania"
-        st.session_state.tables[active_tab] = st.data_editor(
-            st.session_state.tables[active_tab],
-            num_rows="dynamic",
-            column_config=col_cfg,
-            use_container_width=True,
-            key=f"editor_{active_tab}"
-        )
-        
-        if len(st.session_state.tables) > 1 and st.button("Usuń tę tabelę"):
-            del st.session_state.tables[active_tab]
-            st.rerun()
+        measurement_editor(active_tab)
 
     # --- 5. GENERUJ ---
     elif menu == "5. Generuj PDF":
         st.header("Zakończenie")
-        st.session_state.orzeczenie = st.selectbox("Orzeczenie", ["INSTALACJA NADAJE SIĘ DO EKSPLOATACJI", "INSTALACJA NIE NADAJE SIĘ DO EKSPLOATACJI"])
-        st.session_state.uwagi = st.text_area("Uwagi", "Instalacja wykonana zgodnie z normami.")
+        st.session_state.orzeczenie = st.selectbox("Orzeczenie", ORZECZENIA, index=option_index(ORZECZENIA, st.session_state.get('orzeczenie')))
+        st.session_state.uwagi = st.text_area("Uwagi", st.session_state.get('uwagi', UWAGI_DEFAULT))
+        with profiling.span("trend"):
+            comparison = previous_comparison()
+        comparison_section(comparison)
         
         st.divider()
         
-        data = {
-            'meta': {
-                'klient': st.session_state.get('klient', ''), 'obiekt': st.session_state.get('obiekt', ''),
-                'data': st.session_state.get('data', ''), 'wykonawca': st.session_state.get('wykonawca', ''),
-                'nr_uprawnien': st.session_state.get('nr_uprawnien', ''), 'nr_protokolu': st.session_state.get('nr_protokolu', ''),
-                'orzeczenie': st.session_state.get('orzeczenie', '')
-            },
-            'device': {
-                'nazwa': st.session_state.get('dev_nazwa', ''), 'producent': st.session_state.get('dev_prod', ''),
-                'typ': st.session_state.get('dev_typ', ''), 'nr_seryjny': st.session_state.get('dev_sn', '')
-            },
-            'supply': {
-                'uklad': st.session_state.get('sup_uklad', 'TN-C-S'), 'napiecie': st.session_state.get('sup_nap', 230),
-                'czestotliwosc': st.session_state.get('sup_freq', 50), 'ipf': st.session_state.get('sup_ipf', ''),
-                'zab_typ': st.session_state.get('sup_zab_typ', ''), 'zab_prad': st.session_state.get('sup_zab_prad', ''),
-                'uziom_typ': st.session_state.get('sup_uziom_typ', ''), 'ra': st.session_state.get('sup_ra', ''),
-                'ze': st.session_state.get('sup_ze', ''), 'przewod_pe': st.session_state.get('sup_pe', ''),
-                'wyl_glowny': st.session_state.get('sup_main_sw', ''),
-                'bond_woda': st.session_state.get('bond_woda', False), 'bond_gaz': st.session_state.get('bond_gaz', False),
-                'bond_konstr': st.session_state.get('bond_konstr', False), 'bond_co': st.session_state.get('bond_co', False),
-            },
-            'inspekcja': st.session_state.get('inspekcja', {}),
-            'tables': st.session_state.tables,
-            'column_names': st.session_state.column_names,
-            'uwagi': st.session_state.get('uwagi', '')
-        }
-        
-        pdf_buffer = BytesIO()
-        try:
-            EICR_PDF(pdf_buffer, data).generate()
-            st.download_button("⬇️ POBIERZ PDF", pdf_buffer.getvalue(), f"Protokol_{datetime.now().strftime('%Y%m%d')}.pdf", "application/pdf", type="primary")
-        except Exception as e:
-            st.error(f"Błąd: {e}")
+        with profiling.span("payload"):
+            data = build_payload()
+            if comparison is not None and st.session_state.get('trend_pdf'):
+                data['trend'] = trend_payload(comparison[1], comparison[0])
+            # PDF budowany dopiero na żądanie; niezmieniony raport wraca z cache
+            pdf_key = payload_hash(data)
+        if 'pdf_job_done' in st.session_state:
+            job = st.session_state.pop('pdf_job_done')
+            cache_pdf(job.key, job.result)
+            # Czas zlecenia (z kolejką) i odcinki składu z procesów puli - w śladzie tego przebiegu
+            profiling.record("pdf.job", job.duration_ms, job.traces)
+        if st.button("📄 Generuj PDF") and cached_pdf(pdf_key) is None:
+            get_queue().submit(pdf_key, data)
+            st.session_state.pdf_job = pdf_key
+        if 'pdf_job_error' in st.session_state:
+            st.error(f"Błąd: {st.session_state.pop('pdf_job_error')}")
+        if 'pdf_job' in st.session_state:
+            job_progress('pdf_job', "Generowanie protokołu")
+
+        pdf_path = cached_pdf(pdf_key)
+        if pdf_path is not None:
+            st.download_button("⬇️ POBIERZ PDF", partial(read_file, pdf_path), protocol_filename(data['meta']), "application/pdf", type="primary")
+        elif get_pdf_cache() and st.session_state.get('pdf_job') != pdf_key:
+            st.caption("Dane zmieniły się od ostatniego generowania - wygeneruj PDF ponownie.")
+
+    # --- 6. EKSPORT ---
+    elif menu == "6. Eksport ZIP":
+        st.header("Eksport zbiorczy")
+        if 'zip_job_done' in st.session_state:
+            st.session_state.zip_export = st.session_state.pop('zip_job_done')
+            profiling.record("zip.job", st.session_state.zip_export.duration_ms, st.session_state.zip_export.traces)
+        export_section()
+
+    try_autosave()
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    with session_trace("rerun"):
+        # Znacznik pełnego przebiegu dla fragmentów (fragment_autosave); zdejmowany także
+        # przy st.rerun / zatrzymaniu skryptu
+        st.session_state.main_running = True
+        try:
+            main()
+        finally:
+            st.session_state.main_running = False
\ No newline at end of file
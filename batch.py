@@ -0,0 +1,152 @@
+# --- GENEROWANIE WSADOWE (bez Streamlit) ---
+# Użycie:
+#   python batch.py protokoly/ -o pdf/                 (katalog plików *.json)
+#   python batch.py protokoly.jsonl -o pdf/ -j 8        (jeden protokół na linię)
+#   python batch.py pomiary.csv -o pdf/ --template wspolne.json
+# CSV: jeden wiersz na obwód, kolumny nr_protokolu, tabela + kolumny pomiarowe
+# (Nazwa_Obwodu ... RCD_t) i opcjonalnie pola meta (klient, obiekt, data, ...).
+import argparse
+import json
+import os
+import re
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import pandas as pd
+
+from compliance import MEASUREMENT_COLUMNS
+from payload import META_KEYS, merge_payload, normalize_payload
+from pdf_engine import PDF_TARGET_SIZE, write_pdf
+from profiling import trace
+from resources import logo_image
+
+CSV_PROTOCOL_COLUMN = 'nr_protokolu'
+CSV_TABLE_COLUMN = 'tabela'
+CSV_DEFAULT_TABLE = 'Rozdzielnica Główna'
+
+def slugify(text):
+    text = re.sub(r'[^\w.-]+', '_', str(text), flags=re.UNICODE).strip('._')
+    return text or 'protokol'
+
+def parse_record(text):
+    raw = json.loads(text)
+    if not isinstance(raw, dict):
+        raise ValueError("rekord nie jest obiektem JSON")
+    return raw
+
+def read_jobs(source):
+    # Zwraca listę (nazwa, surowy słownik protokołu). Nieczytelny plik / linia trafia do listy
+    # jako (nazwa, wyjątek) - run_batch zgłasza go jako nieudany raport, reszta wsadu przechodzi
+    if os.path.isdir(source):
+        names = sorted(f for f in os.listdir(source) if f.lower().endswith('.json'))
+        jobs = []
+        for f in names:
+            name = os.path.splitext(f)[0]
+            try:
+                with open(os.path.join(source, f), encoding='utf-8') as fh:
+                    jobs.append((name, parse_record(fh.read())))
+            except (OSError, ValueError) as e:
+                jobs.append((name, e))
+        return jobs
+
+    ext = os.path.splitext(source)[1].lower()
+    if ext in ('.jsonl', '.ndjson'):
+        jobs = []
+        with open(source, 'rb') as fh:
+            for line_no, line in enumerate(fh, 1):
+                if not line.strip():
+                    continue
+                try:
+                    raw = parse_record(line.decode('utf-8'))
+                except ValueError as e:
+                    jobs.append((f'linia_{line_no}', e))
+                    continue
+                jobs.append((str((raw.get('meta') or {}).get('nr_protokolu') or f'linia_{line_no}'), raw))
+        return jobs
+    if ext == '.csv':
+        return read_csv_jobs(source)
+    raise ValueError(f"Nieobsługiwany format wejścia: {source}")
+
+def read_csv_jobs(source):
+    # Grupowanie hurtowe: protokół -> tabela -> wiersze pomiarowe
+    df = pd.read_csv(source, dtype={CSV_PROTOCOL_COLUMN: str}, sep=None, engine='python')
+    if CSV_PROTOCOL_COLUMN not in df.columns:
+        df[CSV_PROTOCOL_COLUMN] = '1'
+    if CSV_TABLE_COLUMN not in df.columns:
+        df[CSV_TABLE_COLUMN] = CSV_DEFAULT_TABLE
+    meta_cols = [c for c in META_KEYS if c in df.columns and c != CSV_PROTOCOL_COLUMN]
+    meas_cols = [c for c in MEASUREMENT_COLUMNS if c in df.columns]
+
+    jobs = []
+    for nr, proto in df.groupby(CSV_PROTOCOL_COLUMN, sort=False):
+        first = proto.iloc[0]
+        meta = {c: ('' if pd.isna(first[c]) else first[c]) for c in meta_cols}
+        meta['nr_protokolu'] = nr
+        tables = {str(name): rows[meas_cols].reset_index(drop=True) for name, rows in proto.groupby(CSV_TABLE_COLUMN, sort=False)}
+        jobs.append((str(nr), {'meta': meta, 'tables': tables}))
+    return jobs
+
+def _render_job(name, raw, template, out_path, target_size=PDF_TARGET_SIZE):
+    # Wykonywane w procesie roboczym; błąd jednego raportu nie przerywa wsadu
+    start = time.perf_counter()
+    try:
+        with trace("batch", job=name):
+            size = write_pdf(normalize_payload(merge_payload(template, raw)), out_path, target_size=target_size)
+        return name, out_path, size, time.perf_counter() - start, None
+    except Exception as e:
+        return name, out_path, 0, time.perf_counter() - start, f"{type(e).__name__}: {e}"
+
+def run_batch(jobs, out_dir, template=None, workers=None, target_size=PDF_TARGET_SIZE):
+    os.makedirs(out_dir, exist_ok=True)
+    used = set()
+    results = []
+    logo_image()  # przygotuj logo przed forkiem - procesy robocze dziedziczą cache
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = []
+        for name, raw in jobs:
+            if isinstance(raw, Exception):
+                results.append((name, None, 0, 0.0, f"{type(raw).__name__}: {raw}"))
+                continue
+            base = slugify(name)
+            fname, n = base, 1
+            while fname in used:
+                n += 1
+                fname = f"{base}_{n}"
+            used.add(fname)
+            futures.append(pool.submit(_render_job, name, raw, template, os.path.join(out_dir, fname + '.pdf'), target_size))
+        for fut in as_completed(futures):
+            results.append(fut.result())
+    return results
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="FARAD - wsadowe generowanie protokołów PDF")
+    parser.add_argument('source', help="katalog *.json, plik .jsonl albo .csv")
+    parser.add_argument('-o', '--out', default='pdf', help="katalog wyjściowy (domyślnie ./pdf)")
+    parser.add_argument('-j', '--workers', type=int, default=None, help="liczba procesów (domyślnie liczba rdzeni)")
+    parser.add_argument('--template', help="JSON ze wspólnymi polami (device, supply, inspekcja, ...)")
+    parser.add_argument('--target-kb', type=int, default=PDF_TARGET_SIZE // 1024,
+                        help="docelowy rozmiar PDF w KB - większe dostają mniejsze logo (0 = bez limitu)")
+    args = parser.parse_args(argv)
+
+    template = None
+    if args.template:
+        with open(args.template, encoding='utf-8') as fh:
+            template = json.load(fh)
+
+    jobs = read_jobs(args.source)
+    start = time.perf_counter()
+    results = run_batch(jobs, args.out, template, args.workers, args.target_kb * 1024)
+    elapsed = time.perf_counter() - start
+
+    failed = [r for r in results if r[4]]
+    ok = len(results) - len(failed)
+    total_bytes = sum(r[2] for r in results)
+    for name, path, _, _, error in failed:
+        print(f"BŁĄD {name}: {error}", file=sys.stderr)
+    print(f"Wygenerowano {ok}/{len(results)} protokołów w {elapsed:.2f} s "
+          f"({ok / elapsed if elapsed else 0:.1f} rap./s, {total_bytes / 1e6:.1f} MB) -> {args.out}")
+    return 1 if failed else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
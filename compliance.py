@@ -0,0 +1,51 @@
+# --- OCENA POMIARÓW (kolumnowo, bez pętli po wierszach) ---
+import numpy as np
+import pandas as pd
+
+MEASUREMENT_COLUMNS = ["Nazwa_Obwodu", "Typ_Przewodu", "Przekroj", "Zab_Typ", "Zab_In", "R_ISO", "Zs_pom", "Zs_dop", "RCD_t"]
+STATUS_COLUMN = "Ocena"
+
+STATUS_POS = "POZ"
+STATUS_NEG = "NEG"
+STATUS_INVALID = "BŁĄD"
+
+# Wymagania PN-HD 60364-6
+R_ISO_MIN = 1.0     # MΩ - obwody do 500 V (napięcie probiercze 500 V DC)
+RCD_T_MAX = 300.0   # ms - wyłącznik RCD ogólnego typu przy IΔn
+
+def to_numeric(col):
+    # Hurtowa konwersja kolumny na float64; przecinek dziesiętny dozwolony, śmieci -> NaN
+    if col is None:
+        return None
+    if not pd.api.types.is_numeric_dtype(col):
+        col = col.astype(str).str.strip().str.replace(',', '.', regex=False)
+    return pd.to_numeric(col, errors='coerce').to_numpy(dtype=np.float64, na_value=np.nan)
+
+def evaluate(df):
+    # Zwraca DataFrame (ten sam indeks co df) z wynikami cząstkowymi i kolumną "Ocena"
+    n = len(df)
+    nan = np.full(n, np.nan)
+    zs_pom = to_numeric(df.get('Zs_pom'))
+    zs_dop = to_numeric(df.get('Zs_dop'))
+    r_iso = to_numeric(df.get('R_ISO'))
+    rcd_t = to_numeric(df.get('RCD_t'))
+    zs_pom = nan if zs_pom is None else zs_pom
+    zs_dop = nan if zs_dop is None else zs_dop
+    r_iso = nan if r_iso is None else r_iso
+    rcd_t = nan if rcd_t is None else rcd_t
+
+    # Zs i R_ISO są obowiązkowe; RCD_t = 0 lub puste oznacza obwód bez RCD
+    valid = ~(np.isnan(zs_pom) | np.isnan(zs_dop) | np.isnan(r_iso))
+    zs_ok = ~(zs_pom > zs_dop)
+    riso_ok = ~(r_iso < R_ISO_MIN)
+    rcd_ok = ~(rcd_t > RCD_T_MAX)
+
+    status = np.where(~valid, STATUS_INVALID, np.where(zs_ok & riso_ok & rcd_ok, STATUS_POS, STATUS_NEG))
+    return pd.DataFrame({
+        'Zs_ok': zs_ok, 'R_ISO_ok': riso_ok, 'RCD_ok': rcd_ok, 'Poprawny': valid,
+        STATUS_COLUMN: status,
+    }, index=df.index)
+
+def with_status(df):
+    # Kopia tabeli z dołączoną (tylko do odczytu) kolumną oceny
+    return df.assign(**{STATUS_COLUMN: evaluate(df)[STATUS_COLUMN]})
@@ -0,0 +1,19 @@
+# --- ZAPIS PLIKÓW PRZEZ PLIK TYMCZASOWY ---
+# Plik powstaje obok docelowego i jest podmieniany przez os.replace (atomowe w obrębie katalogu).
+# Bez zależności - używany przez archiwum (store) przed pierwszym załadowaniem stosu PDF.
+import os
+import tempfile
+
+# Umask procesu odczytany raz przy imporcie (os.umask ustawia go globalnie - nie w wątkach roboczych)
+_UMASK = os.umask(0)
+os.umask(_UMASK)
+FILE_MODE = 0o666 & ~_UMASK
+
+def temp_path(path):
+    # Unikalny plik tymczasowy obok `path` - ten sam plik (ten sam skrót) może być zapisywany
+    # jednocześnie w dwóch procesach albo sesjach.
+    # mkstemp tworzy plik 0600, a os.replace zachowuje prawa - zwykłe prawa jak przy open()
+    fd, tmp = tempfile.mkstemp(prefix=os.path.basename(path) + '.', suffix='.tmp', dir=os.path.dirname(os.path.abspath(path)))
+    os.close(fd)
+    os.chmod(tmp, FILE_MODE)
+    return tmp
@@ -0,0 +1,131 @@
+# --- RÓWNOLEGŁE RENDEROWANIE ROZDZIELNIC ---
+# Część wstępna (sekcje 1-5) i każda rozdzielnica budowane są jako osobne fragmenty PDF
+# w puli procesów, a potem sklejane w kolejności i numerowane "Strona X z Y".
+# Każda rozdzielnica zaczyna się od nowej strony. Wymaga pypdf; bez niego - tryb szeregowy.
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from io import BytesIO
+from multiprocessing import spawn
+from multiprocessing.context import SpawnContext, SpawnProcess
+
+from reportlab.lib.pagesizes import A4
+from reportlab.pdfgen import canvas
+
+from files import temp_path
+from pdf_engine import EICR_PDF, draw_page_number
+from profiling import count
+
+PARALLEL_MIN_TABLES = 4   # poniżej tej liczby rozdzielnic pula się nie opłaca
+DEFAULT_MAX_WORKERS = 4   # procesów puli bez FARAD_PDF_WORKERS (każdy to ok. 125 MB RSS)
+MAX_WORKERS = int(os.environ.get("FARAD_PDF_WORKERS") or 0) or min(os.cpu_count() or 1, DEFAULT_MAX_WORKERS)
+
+# Proces 'spawn' wykonuje na starcie moduł __main__ rodzica, a w serwerze Streamlit __main__
+# to app.py (importy streamlit/store, set_page_config). Procesy puli dostają zamiast niego
+# pdf_worker.py - rozpoznawane po nazwie procesu, więc inne procesy 'spawn' bez zmian.
+WORKER_MAIN = os.path.join(os.path.dirname(os.path.abspath(__file__)), "pdf_worker.py")
+WORKER_NAME = "farad-pdf"
+
+class _WorkerProcess(SpawnProcess):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.name = f"{WORKER_NAME}-{self.name}"
+
+class _WorkerContext(SpawnContext):
+    Process = _WorkerProcess
+
+def _preparation_data(name, _base=spawn.get_preparation_data):
+    data = _base(name)
+    if str(name).startswith(WORKER_NAME):
+        data.pop('init_main_from_name', None)
+        data['init_main_from_path'] = WORKER_MAIN
+    return data
+
+if not hasattr(spawn.get_preparation_data, 'worker_main'):   # raz na proces (także po przeładowaniu modułu)
+    _preparation_data.worker_main = WORKER_MAIN
+    spawn.get_preparation_data = _preparation_data
+
+_POOL = None
+_POOL_LOCK = threading.Lock()
+
+def get_pool():
+    # Jedna pula na proces serwera; 'spawn' - bezpieczne w wielowątkowym Streamlit.
+    # Procesy startują przy zadaniach (do MAX_WORKERS), nie wszystkie naraz
+    global _POOL
+    with _POOL_LOCK:
+        if _POOL is None:
+            _POOL = ProcessPoolExecutor(max_workers=MAX_WORKERS, mp_context=_WorkerContext())
+        return _POOL
+
+def reset_pool():
+    # Po awarii procesu roboczego (BrokenProcessPool) pula nie przyjmuje już zadań - następne dostaną nową
+    global _POOL
+    with _POOL_LOCK:
+        if _POOL is not None:
+            _POOL.shutdown(wait=False, cancel_futures=True)
+        _POOL = None
+
+def render_fragment(data, part, logo_step=0):
+    # part: 'intro' albo (nazwa_tabeli, czy_ostatnia) - ostatnia dostaje też porównanie
+    # z poprzednim badaniem (jeśli jest) i stopkę z orzeczeniem
+    buffer = BytesIO()
+    pdf = EICR_PDF(buffer, data, logo_step=logo_step)
+    if part == 'intro':
+        elements = pdf._intro_elements()
+    else:
+        table_name, last = part
+        elements = pdf._table_elements(table_name, data['tables'][table_name])
+        if last:
+            elements.extend(pdf._trend_elements())
+            elements.extend(pdf._closing_elements())
+    pdf.doc.build(elements)
+    return buffer.getvalue()
+
+def merge_fragments(fragments, path):
+    # Zapisuje sklejony PDF do `path` i zwraca jego rozmiar
+    from pypdf import PdfReader, PdfWriter
+    writer = PdfWriter()
+    for fragment in fragments:
+        writer.append(PdfReader(BytesIO(fragment)))
+
+    # Numeracja ciągła: nakładka z numerami stron generowana jednym płótnem
+    total = len(writer.pages)
+    overlay_buffer = BytesIO()
+    overlay = canvas.Canvas(overlay_buffer, pagesize=A4)
+    for page in range(1, total + 1):
+        draw_page_number(overlay, page, total)
+        overlay.showPage()
+    overlay.save()
+    for page, stamp in zip(writer.pages, PdfReader(BytesIO(overlay_buffer.getvalue())).pages):
+        page.merge_page(stamp)
+        page.compress_content_streams()
+
+    # Fragmenty powielają wspólne zasoby (style, obiekty czcionek) - zostaje jedna kopia
+    writer.compress_identical_objects(remove_duplicates=True, remove_unreferenced=True)
+    count("pdf.pages", total)
+    tmp = temp_path(path)
+    try:
+        writer.write(tmp)
+        os.replace(tmp, path)
+    except BaseException:
+        os.remove(tmp)
+        raise
+    size = os.path.getsize(path)
+    count("pdf.bytes", size)
+    return size
+
+def split_fragments(data):
+    # Lista argumentów render_fragment albo None, gdy podział się nie opłaca / brak pypdf.
+    # Każdy proces dostaje tylko swoją tabelę, nie cały protokół.
+    tables = data['tables']
+    if len(tables) < PARALLEL_MIN_TABLES or MAX_WORKERS < 2:
+        return None
+    try:
+        import pypdf  # noqa: F401
+    except ImportError:
+        return None
+    names = list(tables)
+    parts = [({**data, 'tables': {}}, 'intro')]
+    for i, name in enumerate(names):
+        parts.append(({**data, 'tables': {name: tables[name]}}, (name, i == len(names) - 1)))
+    return parts
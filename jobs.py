@@ -0,0 +1,225 @@
+# --- KOLEJKA GENEROWANIA W TLE ---
+# "Generuj PDF" nie blokuje przebiegu skryptu: zlecenie trafia do kolejki, a interfejs
+# odpytuje postęp. Cały skład ReportLab (także sklejanie fragmentów) odbywa się
+# w procesach puli fragments.get_pool() - każdy proces ma własny rejestr pdfmetrics,
+# wypełniany raz przy imporcie pdf_engine, więc wątki serwera go nie dotykają.
+# Zlecenia z tym samym skrótem danych (payload_hash) są łączone - także między sesjami.
+# Wynik to plik w katalogu roboczym (SPOOL_DIR) nazwany skrótem danych - serwer nie trzyma
+# bajtów PDF w pamięci, a ten sam raport wygenerowany wcześniej jest od razu gotowy.
+# Eksport zbiorczy (submit_export) składa wiele protokołów z archiwum w jeden plik ZIP.
+# Przy FARAD_PROFILE=1 każde wywołanie w puli ma własny ślad, który wraca z wynikiem (job.traces).
+import hashlib
+import os
+import tempfile
+import threading
+import time
+import zipfile
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, as_completed, wait
+from concurrent.futures.process import BrokenProcessPool
+from functools import lru_cache
+
+from files import temp_path
+from fragments import MAX_WORKERS, get_pool, merge_fragments, render_fragment, reset_pool, split_fragments
+from payload import normalize_payload, payload_hash, protocol_filename
+from pdf_engine import PDF_TARGET_SIZE, logo_step_for, write_pdf
+from profiling import trace
+
+MAX_JOBS = 2          # zleceń koordynowanych jednocześnie; kolejne czekają w kolejce
+JOB_TTL = 300         # s - jak długo zakończone zlecenie jest widoczne w kolejce
+MAX_FINISHED = 16     # zakończonych zleceń trzymanych w kolejce
+SPOOL_DIR = os.environ.get("FARAD_SPOOL_DIR") or os.path.join(tempfile.gettempdir(), "farad_pdf")
+SPOOL_TTL = 24 * 3600 # s - po tym czasie nieużywany plik PDF jest usuwany
+
+def spool_path(key, ext='pdf'):
+    return os.path.join(SPOOL_DIR, f"{key}.{ext}")
+
+class RenderJob:
+    def __init__(self, key, parts):
+        self.key = key
+        self.total = parts + 1 if parts > 1 else 1   # fragmenty + sklejanie
+        self.done = 0
+        self.submitted = time.time()
+        self.finished = None
+        self.result = None   # ścieżka pliku PDF (ZIP przy eksporcie)
+        self.size = 0
+        self.error = None
+        self.skipped = []    # eksport: (nazwa, błąd) protokołów pominiętych w archiwum
+        self.traces = []     # ślady z procesów puli (Trace.to_dict), gdy diagnostyka włączona
+
+    @property
+    def ready(self):
+        return self.finished is not None
+
+    @property
+    def progress(self):
+        return 1.0 if self.ready else self.done / self.total
+
+    @property
+    def duration_ms(self):
+        return round((self.finished - self.submitted) * 1000, 2) if self.ready else None
+
+def _traced(func, *args):
+    # Wykonywane w procesie puli: odcinki pdf.* i liczniki wracają razem z wynikiem
+    with trace(func.__name__) as t:
+        result = func(*args)
+    return result, (t.to_dict() if t is not None else None)
+
+def _result(job, future):
+    result, record = future.result()
+    if record is not None:
+        job.traces.append(record)
+    return result
+
+class JobQueue:
+    def __init__(self, max_jobs=MAX_JOBS):
+        self._lock = threading.Lock()
+        self._jobs = {}
+        self._runner = ThreadPoolExecutor(max_workers=max_jobs, thread_name_prefix="farad-pdf")
+        os.makedirs(SPOOL_DIR, exist_ok=True)
+
+    def submit(self, key, data):
+        with self._lock:
+            self._prune()
+            job = self._jobs.get(key)
+            if job is not None and job.error is None:
+                return job   # to samo zlecenie już trwa albo jest gotowe
+            path = spool_path(key)
+            if os.path.exists(path):
+                # Ten sam raport wygenerowany wcześniej - wystarczy odświeżyć datę pliku
+                os.utime(path)
+                job = self._jobs[key] = RenderJob(key, 1)
+                job.result, job.size, job.done, job.finished = path, os.path.getsize(path), 1, time.time()
+                return job
+            parts = split_fragments(data)
+            job = self._jobs[key] = RenderJob(key, len(parts) if parts else 1)
+        self._runner.submit(self._run, job, data, parts)
+        return job
+
+    def submit_export(self, store, protocols):
+        # protocols: [(id, zmieniono)] - znacznik zmiany w kluczu, więc edycja protokołu
+        # po eksporcie daje nowe zlecenie zamiast starego archiwum
+        key = "zip-" + hashlib.sha256(repr([(int(i), str(t)) for i, t in protocols]).encode('utf-8')).hexdigest()
+        with self._lock:
+            self._prune()
+            job = self._jobs.get(key)
+            if job is not None and job.error is None:
+                return job
+            job = self._jobs[key] = RenderJob(key, 1)
+            job.total = len(protocols)
+        self._runner.submit(self._run_export, job, store, [int(i) for i, _ in protocols])
+        return job
+
+    def get(self, key):
+        with self._lock:
+            return self._jobs.get(key)
+
+    def _prune(self):
+        now = time.time()
+        finished = sorted((j for j in self._jobs.values() if j.ready), key=lambda j: j.finished)
+        for i, job in enumerate(finished):
+            if now - job.finished > JOB_TTL or i < len(finished) - MAX_FINISHED:
+                del self._jobs[job.key]
+        for entry in os.scandir(SPOOL_DIR):
+            try:
+                if now - entry.stat().st_mtime > SPOOL_TTL:
+                    os.remove(entry.path)
+            except OSError:
+                pass
+
+    def _run(self, job, data, parts):
+        pool = get_pool()
+        path = spool_path(job.key)
+        try:
+            if parts is None:
+                job.size = _result(job, pool.submit(_traced, write_pdf, data, path))
+            else:
+                futures = {pool.submit(_traced, render_fragment, *part): i for i, part in enumerate(parts)}
+                fragments = [None] * len(parts)
+                for future in as_completed(futures):
+                    fragments[futures[future]] = _result(job, future)
+                    job.done += 1
+                job.size = _result(job, pool.submit(_traced, merge_fragments, fragments, path))
+                # Logo jest tylko we wstępie - przy przekroczeniu rozmiaru wystarczy złożyć go ponownie
+                step = logo_step_for(job.size, PDF_TARGET_SIZE)
+                if step:
+                    fragments[0] = _result(job, pool.submit(_traced, render_fragment, *parts[0], step))
+                    job.size = _result(job, pool.submit(_traced, merge_fragments, fragments, path))
+            job.result = path
+            job.done = job.total
+        except BrokenProcessPool as e:
+            reset_pool()
+            job.error = f"{type(e).__name__}: {e}"
+        except Exception as e:
+            job.error = f"{type(e).__name__}: {e}"
+        finally:
+            job.finished = time.time()
+
+    def _run_export(self, job, store, protocol_ids):
+        # Protokoły składane są równolegle (po jednym na proces puli), a każdy gotowy PDF od razu
+        # dopisywany do ZIP z pliku - w pamięci serwera są tylko dane protokołów w toku,
+        # nigdy bajty całego archiwum. Nazwy nadawane w kolejności wyboru, więc są powtarzalne.
+        pool = get_pool()
+        path = spool_path(job.key, 'zip')
+        tmp = temp_path(path)   # ponowione zlecenie nie nadpisze pliku eksportu jeszcze w toku
+        pending, used = {}, set()
+        todo = iter(protocol_ids)
+        limit = MAX_WORKERS
+
+        def add(zf, name, pdf_path):
+            zf.write(pdf_path, name)
+            os.utime(pdf_path)
+            job.done += 1
+
+        def feed(zf):
+            for protocol_id in todo:
+                name = f"#{protocol_id}"
+                try:
+                    meta, tables = store.open(protocol_id)
+                    data = normalize_payload({**meta, 'tables': {t: tables[t] for t in tables}})
+                    name = protocol_filename(data['meta'], used)
+                    pdf_path = spool_path(payload_hash(data))
+                except Exception as e:
+                    job.skipped.append((name, f"{type(e).__name__}: {e}"))
+                    job.done += 1
+                    continue
+                if os.path.exists(pdf_path):
+                    add(zf, name, pdf_path)   # ten sam raport już w katalogu roboczym
+                    continue
+                pending[pool.submit(_traced, write_pdf, data, pdf_path)] = (name, pdf_path)
+                if len(pending) >= limit:
+                    return
+
+        try:
+            # Strumienie PDF są już skompresowane, ale słownik obiektów nie - deflate daje ok. 15%
+            with zipfile.ZipFile(tmp, 'w', zipfile.ZIP_DEFLATED) as zf:
+                feed(zf)
+                while pending:
+                    finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in finished:
+                        name, pdf_path = pending.pop(future)
+                        try:
+                            _result(job, future)
+                        except BrokenProcessPool:
+                            raise
+                        except Exception as e:
+                            job.skipped.append((name, f"{type(e).__name__}: {e}"))
+                            job.done += 1
+                            continue
+                        add(zf, name, pdf_path)
+                    feed(zf)
+            os.replace(tmp, path)
+            job.result, job.size = path, os.path.getsize(path)
+        except BrokenProcessPool as e:
+            reset_pool()
+            job.error = f"{type(e).__name__}: {e}"
+        except Exception as e:
+            job.error = f"{type(e).__name__}: {e}"
+        finally:
+            if job.error and os.path.exists(tmp):
+                os.remove(tmp)
+            job.finished = time.time()
+
+@lru_cache(maxsize=None)
+def get_queue():
+    # Jedna kolejka na proces serwera - wspólna dla wszystkich sesji
+    return JobQueue()
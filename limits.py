@@ -0,0 +1,76 @@
+# --- DOPUSZCZALNA IMPEDANCJA PĘTLI ZWARCIA (Zs_dop) ---
+# Zs_dop = U0 / Ia, gdzie Ia to prąd zapewniający samoczynne wyłączenie w wymaganym
+# czasie (PN-HD 60364-4-41, układ TN): 0.4 s dla obwodów odbiorczych do 32 A, 5 s powyżej.
+# Tablice liczone są raz przy imporcie; wypełnianie tabel odbywa się wektorowo.
+import numpy as np
+import pandas as pd
+
+from compliance import to_numeric
+
+RATINGS = np.array([2, 4, 6, 10, 13, 16, 20, 25, 32, 40, 50, 63, 80, 100, 125, 160, 200], dtype=np.float64)
+FINAL_CIRCUIT_MAX_IN = 32   # A - do tej wartości wymagane 0.4 s
+TIMES = (0.4, 5.0)          # s - indeksy ostatniej osi tablicy IA
+
+# Wyłączniki nadprądowe (PN-EN 60898): Ia = krotność * In, niezależnie od czasu
+MCB_MULTIPLIERS = {"B": 5, "C": 10, "D": 20, "K": 14, "Z": 3}
+
+# Wkładki gG/gL (PN-EN 60269): In -> (Ia dla 0.4 s, Ia dla 5 s) w amperach
+FUSE_IA = {
+    6: (27, 17), 10: (46, 31), 13: (65, 42), 16: (85, 55), 20: (130, 79), 25: (160, 100),
+    32: (221, 125), 40: (280, 170), 50: (383, 221), 63: (500, 280),
+    80: (np.nan, 400), 100: (np.nan, 550), 125: (np.nan, 690), 160: (np.nan, 920), 200: (np.nan, 1200),
+}
+FUSE_TYPES = ("GG", "GL")
+
+def _build_tables():
+    types = list(MCB_MULTIPLIERS) + list(FUSE_TYPES)
+    ia = np.full((len(types), len(RATINGS), len(TIMES)), np.nan)
+    for t, name in enumerate(types):
+        if name in MCB_MULTIPLIERS:
+            ia[t, :, :] = (RATINGS * MCB_MULTIPLIERS[name])[:, None]
+        else:
+            for r, rating in enumerate(RATINGS):
+                if int(rating) in FUSE_IA:
+                    ia[t, r, :] = FUSE_IA[int(rating)]
+    return {name: i for i, name in enumerate(types)}, ia
+
+TYPE_INDEX, IA = _build_tables()
+
+# Napięcia znamionowe sieci (PN-EN 60038): międzyfazowe -> U0 względem ziemi. 400/√3 = 230.9 V
+# zawyżałoby Zs_dop (np. B16: 2.88 zamiast 2.87 Ω) - to przybliżenie nie jest bezpieczne
+NOMINAL_U0 = {400: 230, 690: 400}
+# Zs_dop to górna granica - zaokrąglenie do 0.01 Ω zawsze w dół (B16: 230/80 = 2.875 -> 2.87).
+# Tolerancja chroni wartości dokładne przed błędem zapisu binarnego (230/100 = 2.3 -> 229.999...)
+ZS_DECIMALS = 2
+ROUND_EPS = 1e-9
+
+def phase_voltage(napiecie):
+    # U0 względem ziemi: 400 V (międzyfazowe) -> 230 V; inne napięcia międzyfazowe - U/√3
+    napiecie = float(napiecie or 230)
+    if napiecie in NOMINAL_U0:
+        return float(NOMINAL_U0[napiecie])
+    return napiecie / np.sqrt(3) if napiecie > 250 else napiecie
+
+def zs_dop(zab_typ, zab_in, napiecie=230):
+    # Wektorowo: kolumny typu i prądu zabezpieczenia -> tablica Zs_dop [Ω] (NaN gdy nieznane)
+    typ = pd.Series(zab_typ).astype(str).str.strip().str.upper()
+    t_idx = typ.map(TYPE_INDEX).to_numpy(dtype=np.float64)
+    i_n = to_numeric(pd.Series(zab_in))
+    r_idx = np.searchsorted(RATINGS, i_n).clip(0, len(RATINGS) - 1)
+
+    known = ~np.isnan(t_idx) & (RATINGS[r_idx] == i_n)
+    time_idx = (i_n > FINAL_CIRCUIT_MAX_IN).astype(np.intp)
+    ia = np.full(len(typ), np.nan)
+    ia[known] = IA[t_idx[known].astype(np.intp), r_idx[known], time_idx[known]]
+    scale = 10 ** ZS_DECIMALS
+    return np.floor(phase_voltage(napiecie) / ia * scale + ROUND_EPS) / scale
+
+def fill_zs_dop(df, napiecie=230):
+    # Kopia tabeli z Zs_dop uzupełnionym z tablic; wiersze z nieznanym zabezpieczeniem bez zmian
+    limits = zs_dop(df['Zab_Typ'], df['Zab_In'], napiecie)
+    known = ~np.isnan(limits)
+    out = df.copy()
+    if known.any():
+        zs = to_numeric(out['Zs_dop'])
+        out['Zs_dop'] = np.where(known, limits, zs)
+    return out
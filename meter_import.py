@@ -0,0 +1,130 @@
+# --- IMPORT Z MIERNIKA (eksport CSV/XML, np. Sonel MPI-540 / Sonel Reports) ---
+# Cały plik wczytywany jest kolumnowo (pyarrow, gdy dostępny), nagłówki mapowane są
+# na schemat tabel pomiarowych, a wiersze dzielone na rozdzielnice jednym groupby.
+import os
+import re
+import unicodedata
+from io import BytesIO, StringIO
+
+import numpy as np
+import pandas as pd
+
+from compliance import MEASUREMENT_COLUMNS
+from limits import zs_dop
+from schema import conform, parse_number
+
+DEFAULT_BOARD = "Import"
+NUMERIC_COLUMNS = ["Przekroj", "Zab_In", "R_ISO", "Zs_pom", "Zs_dop", "RCD_t"]
+
+# Znormalizowany nagłówek z pliku -> kolumna schematu
+ALIASES = {
+    "Nazwa_Obwodu": ["nazwa_obwodu", "obwod", "nazwa", "opis", "punkt", "punkt_pomiarowy", "circuit", "name"],
+    "Typ_Przewodu": ["typ_przewodu", "przewod", "kabel", "cable", "wire"],
+    "Przekroj": ["przekroj", "mm2", "przekroj_mm2", "csa", "section"],
+    "Zab_Typ": ["zab_typ", "typ_zabezpieczenia", "charakterystyka", "char", "typ_zab", "breaker_type"],
+    "Zab_In": ["zab_in", "in", "prad_znamionowy", "prad_zab", "breaker_in", "rating"],
+    "R_ISO": ["r_iso", "riso", "rizo", "rezystancja_izolacji", "izolacja", "insulation"],
+    "Zs_pom": ["zs_pom", "zs", "impedancja_petli", "impedancja_petli_zwarcia", "zs_zmierzone", "zs_meas", "loop_impedance"],
+    "Zs_dop": ["zs_dop", "zs_max", "zsmax", "zdop", "zs_dopuszczalne", "zs_limit"],
+    "RCD_t": ["rcd_t", "ta", "t_a", "czas_zadzialania", "t_rcd", "rcd_time", "trip_time"],
+}
+BOARD_ALIASES = ["rozdzielnica", "tablica", "rozdzielnia", "tabela", "switchboard", "board", "distribution_board"]
+# Kolumna łączona typu "B16" / "gG 25A" rozbijana na Zab_Typ + Zab_In
+PROTECTION_ALIASES = ["zabezpieczenie", "zab", "wylacznik", "protection", "breaker"]
+
+_LOOKUP = {alias: col for col, aliases in ALIASES.items() for alias in aliases}
+
+def normalize_header(name):
+    # "Zs [Ω]" -> "zs", "Prąd znamionowy (A)" -> "prad_znamionowy"
+    name = re.sub(r'[\[(].*?[\])]', '', str(name)).replace('ł', 'l').replace('Ł', 'L')
+    name = unicodedata.normalize('NFKD', name).encode('ascii', 'ignore').decode('ascii')
+    return re.sub(r'[^a-z0-9]+', '_', name.lower()).strip('_')
+
+def _sniff_separator(sample):
+    first = sample.splitlines()[0] if sample else ''
+    return max([';', ',', '\t', '|'], key=first.count)
+
+def decode_text(content):
+    # Eksporty z polskich programów pod Windows bywają w CP1250 ("Obwód" -> b"Obw\xf3d")
+    try:
+        return content.decode('utf-8-sig')
+    except UnicodeDecodeError:
+        return content.decode('cp1250', errors='replace')
+
+def read_csv(content):
+    text = decode_text(content) if isinstance(content, bytes) else content
+    sep = _sniff_separator(text[:4096])
+    try:
+        import pyarrow  # noqa: F401
+        engine = 'pyarrow'
+    except ImportError:
+        engine = 'c'
+    return pd.read_csv(StringIO(text), sep=sep, dtype=str, engine=engine)
+
+def read_xml(content):
+    # Wiersze to powtarzające się elementy: dzieci korzenia albo o poziom głębiej
+    try:
+        import lxml  # noqa: F401
+        parser = 'lxml'
+    except ImportError:
+        parser = 'etree'
+    try:
+        df = pd.read_xml(BytesIO(content), xpath='./*', parser=parser, dtype=str)
+    except ValueError:
+        return pd.DataFrame()   # pusty korzeń - brak obwodów (import_measurements zgłasza błąd)
+    if len(df) <= 1:
+        try:
+            df = pd.read_xml(BytesIO(content), xpath='./*/*', parser=parser, dtype=str)
+        except ValueError:
+            pass   # jeden obwód bez elementów podrzędnych - to już jest wiersz
+    return df
+
+def map_columns(raw, board_name=DEFAULT_BOARD):
+    # Surowa ramka z pliku -> ramka ze schematem MEASUREMENT_COLUMNS + kolumna "Rozdzielnica"
+    rename, board_col, protection_col = {}, None, None
+    for col in raw.columns:
+        key = normalize_header(col)
+        target = _LOOKUP.get(key)
+        if target and target not in rename.values():
+            rename[col] = target
+        elif key in BOARD_ALIASES and board_col is None:
+            board_col = col
+        elif key in PROTECTION_ALIASES and protection_col is None:
+            protection_col = col
+
+    out = pd.DataFrame(index=raw.index)
+    for src, dst in rename.items():
+        out[dst] = raw[src]
+    if protection_col is not None:
+        parts = raw[protection_col].astype(str).str.extract(r'^\s*([A-Za-z]+)\s*(\d+(?:[.,]\d+)?)')
+        if 'Zab_Typ' not in out:
+            out['Zab_Typ'] = parts[0]
+        if 'Zab_In' not in out:
+            out['Zab_In'] = parts[1]
+    out = out.reindex(columns=MEASUREMENT_COLUMNS)
+
+    for col in NUMERIC_COLUMNS:
+        out[col] = parse_number(out[col])
+    out['RCD_t'] = out['RCD_t'].fillna(0)  # brak pomiaru RCD = obwód bez RCD (jak w edytorze)
+    for col in ["Nazwa_Obwodu", "Typ_Przewodu", "Zab_Typ"]:
+        out[col] = out[col].fillna('').astype(str).str.strip()
+    zab_in = out['Zab_In'].to_numpy()
+    if not np.isnan(zab_in).any() and (zab_in == np.round(zab_in)).all():
+        out['Zab_In'] = zab_in.astype(np.int64)
+
+    out['Rozdzielnica'] = raw[board_col].fillna(board_name).astype(str).str.strip() if board_col is not None else board_name
+    return out
+
+def import_measurements(content, filename, napiecie=230):
+    # Zwraca {rozdzielnica: DataFrame}; brakujące Zs_dop uzupełniane z tablic zabezpieczeń
+    ext = os.path.splitext(filename)[1].lower()
+    raw = read_xml(content) if ext == '.xml' else read_csv(content)
+    df = map_columns(raw, os.path.splitext(os.path.basename(filename))[0] or DEFAULT_BOARD)
+    if df.empty:
+        raise ValueError("plik nie zawiera wierszy z pomiarami obwodów")
+
+    missing = np.isnan(df['Zs_dop'].to_numpy())
+    if missing.any():
+        df['Zs_dop'] = np.where(missing, zs_dop(df['Zab_Typ'], df['Zab_In'], napiecie), df['Zs_dop'])
+
+    return {name: conform(rows[MEASUREMENT_COLUMNS].reset_index(drop=True)) for name, rows in df.groupby('Rozdzielnica', sort=False)}
@@ -0,0 +1,93 @@
+# --- DANE PROTOKOŁU (słownik `data` przekazywany do EICR_PDF) ---
+# Ten sam kształt, który buduje main() w app.py; tutaj w wersji niezależnej od Streamlit,
+# żeby dało się go wczytać z pliku (JSON/JSONL/CSV) i przesłać do procesu roboczego.
+import hashlib
+import json
+import re
+
+import pandas as pd
+
+from schema import conform
+
+META_KEYS = ['klient', 'obiekt', 'data', 'wykonawca', 'nr_uprawnien', 'nr_protokolu', 'orzeczenie']
+DEVICE_KEYS = ['nazwa', 'producent', 'typ', 'nr_seryjny']
+DEFAULT_SUPPLY = {
+    'uklad': 'TN-C-S', 'napiecie': 230, 'czestotliwosc': 50, 'ipf': '',
+    'zab_typ': '', 'zab_prad': '', 'uziom_typ': '', 'ra': '', 'ze': '', 'przewod_pe': '', 'wyl_glowny': '',
+    'bond_woda': False, 'bond_gaz': False, 'bond_konstr': False, 'bond_co': False,
+}
+
+def merge_payload(base, override):
+    # Płytkie scalanie sekcji: wartości z `override` nadpisują `base`
+    out = dict(base or {})
+    for key, value in (override or {}).items():
+        if isinstance(value, dict) and isinstance(out.get(key), dict) and key != 'tables':
+            out[key] = {**out[key], **value}
+        else:
+            out[key] = value
+    return out
+
+def normalize_payload(raw):
+    # Uzupełnia brakujące pola i zamienia tabele (listy rekordów) na DataFrame w schemacie schema.SCHEMA
+    raw = raw or {}
+    tables = {}
+    for name, table in (raw.get('tables') or {}).items():
+        df = table if isinstance(table, pd.DataFrame) else pd.DataFrame(table)
+        tables[str(name)] = conform(df)
+    return {
+        'meta': {k: (raw.get('meta') or {}).get(k, '') for k in META_KEYS},
+        'device': {k: (raw.get('device') or {}).get(k, '') for k in DEVICE_KEYS},
+        'supply': {**DEFAULT_SUPPLY, **(raw.get('supply') or {})},
+        'inspekcja': dict(raw.get('inspekcja') or {}),
+        'tables': tables,
+        'column_names': dict(raw.get('column_names') or {}),
+        'uwagi': raw.get('uwagi', ''),
+    }
+
+def payload_to_json(data):
+    # Odwrotność normalize_payload - słownik gotowy do json.dumps
+    out = {k: v for k, v in data.items() if k != 'tables'}
+    out['meta'] = {k: str(v) for k, v in data['meta'].items()}
+    out['tables'] = {name: df.astype(object).where(df.notna(), None).to_dict('records') for name, df in data['tables'].items()}
+    return out
+
+# --- NAZWY PLIKÓW ---
+def filename_part(text):
+    # "1/2026" -> "1-2026", "ul. Polna 3" -> "ul-Polna-3"; polskie litery zostają
+    return re.sub(r'[^\w]+', '-', str(text or ''), flags=re.UNICODE).strip('-_')
+
+def protocol_filename(meta, used=None, ext='pdf'):
+    # Nazwa z numeru protokołu i obiektu - ta sama dla tych samych danych, niezależnie od dnia.
+    # `used` (zbiór) rozróżnia powtórzenia w jednym archiwum ZIP: nazwa, nazwa_2, nazwa_3...
+    base = "_".join(p for p in (filename_part(meta.get('nr_protokolu')), filename_part(meta.get('obiekt'))) if p) or "Protokol"
+    name, n = f"{base}.{ext}", 1
+    while used is not None and name.lower() in used:
+        n += 1
+        name = f"{base}_{n}.{ext}"
+    if used is not None:
+        used.add(name.lower())
+    return name
+
+# --- SKRÓTY (cache PDF, autozapis) ---
+STATIC_KEYS = ('meta', 'device', 'supply', 'inspekcja', 'column_names', 'uwagi')
+
+def meta_hash(data):
+    static = {k: data.get(k) for k in STATIC_KEYS}
+    return hashlib.sha256(json.dumps(static, sort_keys=True, default=str, ensure_ascii=False).encode('utf-8')).hexdigest()
+
+def table_hash(df):
+    h = hashlib.sha256()
+    h.update(json.dumps([list(map(str, df.columns)), list(map(str, df.dtypes))]).encode('utf-8'))
+    h.update(pd.util.hash_pandas_object(df, index=True).values.tobytes())
+    return h.hexdigest()
+
+def payload_hash(data):
+    # Stabilny skrót danych protokołu - ten sam raport = ten sam klucz
+    h = hashlib.sha256(meta_hash(data).encode('ascii'))
+    for table_name, df in data['tables'].items():
+        h.update(b'\x00' + str(table_name).encode('utf-8'))
+        h.update(table_hash(df).encode('ascii'))
+    if data.get('trend'):
+        # Sekcja porównania (trend.trend_payload) - tylko w PDF, poza autozapisem
+        h.update(b'\x00trend' + json.dumps(data['trend'], sort_keys=True, default=str, ensure_ascii=False).encode('utf-8'))
+    return h.hexdigest()
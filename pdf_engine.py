@@ -0,0 +1,519 @@
+# --- SILNIK PDF (bez zależności od Streamlit) ---
+import os
+from functools import lru_cache
+from io import BytesIO
+from reportlab.lib import colors
+from reportlab.lib.pagesizes import A4
+from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer, Image, Flowable
+from reportlab.lib.units import mm
+from reportlab.pdfgen import canvas
+from compliance import evaluate, MEASUREMENT_COLUMNS, STATUS_COLUMN
+from schema import column_text
+from resources import register_fonts, logo_image, pdf_styles, LOGO_WIDTH, LOGO_STEPS, PRIMARY_COLOR
+from profiling import span, count
+from files import temp_path
+
+# --- OBSŁUGA CZCIONEK OFFLINE ---
+# Rejestracja raz na proces (resources.register_fonts jest cache'owane)
+FONT_NAME, FONT_NAME_BOLD, HAS_POLISH_FONT = register_fonts()
+
+# Bez czcionki z polskimi znakami: ą -> a itd., jedną tablicą str.translate
+PL_ASCII = str.maketrans("ąćęłńóśźżĄĆĘŁŃÓŚŹŻ", "acelnoszzACELNOSZZ")
+COLUMN_SEP = "\x00"   # nie występuje w tekście komórek
+
+def clean_text(text):
+    return str(text) if HAS_POLISH_FONT else str(text).translate(PL_ASCII)
+
+def clean_column(texts):
+    # Cała kolumna jednym przebiegiem translate zamiast wywołania na komórkę
+    if HAS_POLISH_FONT or not texts:
+        return texts
+    return COLUMN_SEP.join(texts).translate(PL_ASCII).split(COLUMN_SEP)
+
+# --- NUMERACJA STRON ---
+def draw_page_number(canv, page, total):
+    canv.saveState()
+    canv.setFont(FONT_NAME, 7)
+    canv.setFillColor(colors.grey)
+    canv.drawRightString(A4[0] - 10*mm, 5*mm, clean_text(f"Strona {page} z {total}"))
+    canv.restoreState()
+
+class NumberedCanvas(canvas.Canvas):
+    # "Strona X z Y" - liczba stron znana dopiero po złożeniu całego dokumentu
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._saved_page_states = []
+
+    def showPage(self):
+        self._saved_page_states.append(dict(self.__dict__))
+        self._startPage()
+
+    def save(self):
+        total = len(self._saved_page_states)
+        count("pdf.pages", total)
+        for state in self._saved_page_states:
+            self.__dict__.update(state)
+            draw_page_number(self, self._pageNumber, total)
+            super().showPage()
+        super().save()
+
+# --- SZABLON (elementy stałe raportu) ---
+MEAS_COL_WIDTHS = [48*mm, 15*mm, 10*mm, 14*mm, 11*mm, 18*mm, 18*mm, 18*mm, 15*mm, 23*mm]
+MEAS_PAGED_THRESHOLD = 200    # powyżej tej liczby wierszy tabela składana stronami (PagedTable)
+TEXT_COLUMNS = [MEASUREMENT_COLUMNS.index(col) for col in ("Nazwa_Obwodu", "Typ_Przewodu", "Zab_Typ")]
+
+SUPPLY_LABELS = ["Układ sieci", "Napięcie", "Uziom", "Częstotliwość", "Rez. Uziomu RA", "Zab. Przedlicz.",
+                 "Impedancja Ze", "Spodziewany Ipf", "Przewód PE", "Wyłącznik Gł.", "Połączenia wyrównawcze główne:"]
+
+class RenderTemplate:
+    # Style, nagłówki i stałe napisy raportu - budowane raz na konfigurację (czcionka procesu
+    # + nazwy kolumn), tak że EICR_PDF składa już tylko dane zmienne. Paragraph i TableStyle
+    # są współdzielone między kolejnymi raportami procesu; skład odbywa się w procesach puli
+    # (fragments.get_pool, batch), po jednym dokumencie naraz.
+    def __init__(self, column_names):
+        for name, style in pdf_styles(FONT_NAME, FONT_NAME_BOLD, PRIMARY_COLOR).items():
+            setattr(self, f"style_{name}", style)
+
+        self.no_logo = clean_text("[BRAK LOGO]")
+        self.title = Paragraph(f"<b>{clean_text('PROTOKÓŁ BADAŃ INSTALACJI ELEKTRYCZNEJ')}</b><br/>{clean_text('zgodny z PN-HD 60364-6')}", self.style_header)
+        self.head_style = TableStyle([('VALIGN', (0,0), (-1,-1), 'MIDDLE'), ('ALIGN', (1,0), (1,0), 'RIGHT')])
+        self.info_labels = {text: Paragraph(f"<b>{clean_text(text)}</b>", self.style_label)
+                            for text in ('ZLECENIODAWCA:', 'OBIEKT:', 'DATA BADANIA:', 'PROTOKÓŁ NR:')}
+        self.info_style = TableStyle([
+            ('GRID', (0,0), (-1,-1), 0.5, colors.grey),
+            ('BACKGROUND', (0,0), (0,-1), colors.HexColor("#f0f0f0")),
+            ('BACKGROUND', (2,0), (2,-1), colors.HexColor("#f0f0f0")),
+            ('VALIGN', (0,0), (-1,-1), 'MIDDLE'),
+        ])
+        self.meter_style = TableStyle([
+            ('BOX', (0,0), (-1,-1), 0.5, colors.HexColor(PRIMARY_COLOR)),
+            ('BACKGROUND', (0,0), (-1,-1), colors.HexColor("#e6efff")), 
+            ('ALIGN', (0,0), (-1,-1), 'LEFT'),
+            ('LEFTPADDING', (0,0), (-1,-1), 6),
+        ])
+
+        self.supply_title = Paragraph(clean_text("I. CHARAKTERYSTYKA ZASILANIA (PN-HD 60364)"), self.style_subheader)
+        self.supply_labels = {text: Paragraph(f"<b>{clean_text(text)}</b>", self.style_label) for text in SUPPLY_LABELS}
+        self.supply_style = TableStyle([
+            ('GRID', (0,0), (-1,-1), 0.5, colors.grey),
+            ('BACKGROUND', (0,0), (0,-1), colors.whitesmoke), 
+            ('BACKGROUND', (2,0), (2,-1), colors.whitesmoke), 
+            ('VALIGN', (0,0), (-1,-1), 'MIDDLE'),
+        ])
+        self.bond_style = TableStyle([
+            ('BOX', (0,0), (-1,-1), 0.5, colors.grey),
+            ('BACKGROUND', (0,0), (0,0), colors.whitesmoke),
+            ('VALIGN', (0,0), (-1,-1), 'MIDDLE'),
+        ])
+
+        self.inspection_title = Paragraph(clean_text("II. WYNIKI OGLĘDZIN (PN-HD 60364-6 p. 6.4.2)"), self.style_subheader)
+        self.inspection_results = {res: clean_text(res) for res in ("POZYTYWNY", "NEGATYWNY", "N/D")}
+        self.no_inspection = Paragraph(clean_text("Brak wyników oględzin."), self.style_small)
+        self.inspection_style = TableStyle([
+            ('GRID', (0,0), (-1,-1), 0.5, colors.lightgrey),
+            ('VALIGN', (0,0), (-1,-1), 'MIDDLE'),
+        ])
+
+        self.measurement_header = self._measurement_header(column_names)
+        self.measurement_style = TableStyle([
+            ('SPAN', (0,0), (0,1)), ('SPAN', (1,0), (2,0)), ('SPAN', (3,0), (4,0)),
+            ('SPAN', (5,0), (5,1)), ('SPAN', (6,0), (7,0)), ('SPAN', (8,0), (8,1)), ('SPAN', (9,0), (9,1)),
+            ('FONTNAME', (0,0), (-1,-1), FONT_NAME), 
+            ('FONTSIZE', (0,0), (-1,-1), 7),
+            ('FONTNAME', (0,0), (-1,1), FONT_NAME_BOLD),
+            ('BACKGROUND', (0,0), (-1,1), colors.HexColor(PRIMARY_COLOR)),
+            ('TEXTCOLOR', (0,0), (-1,1), colors.whitesmoke),
+            ('ALIGN', (0,0), (-1,-1), 'CENTER'), 
+            ('VALIGN', (0,0), (-1,-1), 'MIDDLE'),
+            ('ALIGN', (0,2), (0,-1), 'LEFT'),
+            ('GRID', (0,0), (-1,-1), 0.5, colors.grey),
+            ('LEFTPADDING', (0,0), (-1,-1), 2),
+            ('RIGHTPADDING', (0,0), (-1,-1), 2),
+        ])
+
+        self.trend_header = [
+            [clean_text(h) for h in ("Rozdzielnica", "Obwód", "R_ISO [MΩ]", "", "Zs [Ω]", "", "RCD [ms]", "")],
+            ["", ""] + [clean_text(h) for h in ("poprz.", "obecnie")] * 3,
+        ]
+        self.trend_style = TableStyle([
+            ('SPAN', (0,0), (0,1)), ('SPAN', (1,0), (1,1)), ('SPAN', (2,0), (3,0)), ('SPAN', (4,0), (5,0)), ('SPAN', (6,0), (7,0)),
+            ('FONTNAME', (0,0), (-1,-1), FONT_NAME),
+            ('FONTSIZE', (0,0), (-1,-1), 7),
+            ('FONTNAME', (0,0), (-1,1), FONT_NAME_BOLD),
+            ('BACKGROUND', (0,0), (-1,1), colors.HexColor(PRIMARY_COLOR)),
+            ('TEXTCOLOR', (0,0), (-1,1), colors.whitesmoke),
+            ('ALIGN', (0,0), (-1,-1), 'CENTER'),
+            ('ALIGN', (0,2), (1,-1), 'LEFT'),
+            ('VALIGN', (0,0), (-1,-1), 'MIDDLE'),
+            ('GRID', (0,0), (-1,-1), 0.5, colors.grey),
+            ('LEFTPADDING', (0,0), (-1,-1), 2),
+            ('RIGHTPADDING', (0,0), (-1,-1), 2),
+        ])
+
+        self.closing_title = Paragraph(f"<b>{clean_text('IV. UWAGI KOŃCOWE I ORZECZENIE')}</b>", self.style_header)
+        self.uwagi_style = TableStyle([
+            ('BOX', (0,0), (-1,-1), 0.5, colors.black),
+            ('BACKGROUND', (0,0), (-1,-1), colors.whitesmoke),
+            ('VALIGN', (0,0), (-1,-1), 'TOP'),
+        ])
+        self.signature = clean_text("Podpis: .............................")
+
+    @staticmethod
+    def _measurement_header(custom_cols):
+        h_obwod = clean_text(custom_cols.get("Nazwa_Obwodu", "Obwód / Opis"))
+        h_przewody = clean_text("Przewody")
+        h_rodzaj = clean_text(custom_cols.get("Typ_Przewodu", "Typ"))
+        h_zab = clean_text("Zabezp.")
+        h_typ_zab = clean_text(custom_cols.get("Zab_Typ", "Typ"))
+        h_riso = clean_text(custom_cols.get("R_ISO", "R_ISO"))
+        h_imp = clean_text(custom_cols.get("Zs_pom", "Pętla (Zs)"))
+        h_ocena = clean_text("Ocena")
+
+        return [
+            [h_obwod, h_przewody, "", h_zab, "", h_riso, h_imp, "", "RCD", h_ocena],
+            ["", h_rodzaj, "mm2", h_typ_zab, "In", "M_Ohm", "Z_pom", "Z_dop", "ms", ""]
+        ]
+
+@lru_cache(maxsize=32)
+def _render_template(column_items):
+    return RenderTemplate(dict(column_items))
+
+def render_template(column_names):
+    return _render_template(tuple(sorted((str(k), str(v)) for k, v in (column_names or {}).items())))
+
+# --- DUŻE TABELE (strona po stronie) ---
+class PagedTable(Flowable):
+    # Tabela pomiarów składana stronami: na każdą stronę osobna Table z nagłówkiem i tyloma
+    # wierszami, ile zmieści ramka. ReportLab nie dzieli jednej tabeli z tysiącami wierszy
+    # (koszt rośnie nieliniowo), a nagłówek jest dokładnie raz na stronie. Wysokość wiersza
+    # mierzona na pierwszym wierszu (komórki jednowierszowe); gdyby tabela strony jednak się
+    # nie zmieściła, dzieli ją zwykły Table.split z repeatRows.
+    def __init__(self, make_table, header_rows, rows, start=0, heights=None):
+        super().__init__()
+        self.hAlign = 'CENTER'   # jak Table
+        self.make_table = make_table
+        self.header_rows = header_rows
+        self.rows = rows
+        self.start = start
+        if heights is None:
+            # Table.wrap przestaje liczyć wiersze po przekroczeniu dostępnej wysokości - pełna strona
+            header_h = make_table(header_rows).wrap(A4[0], A4[1])[1]
+            heights = (header_h, make_table(header_rows + rows[:1]).wrap(A4[0], A4[1])[1] - header_h)
+        self.header_h, self.row_h = heights
+        self._table = None
+
+    def _page(self, end):
+        return self.make_table(self.header_rows + self.rows[self.start:end])
+
+    def wrap(self, availWidth, availHeight):
+        height = self.header_h + (len(self.rows) - self.start) * self.row_h
+        if height <= availHeight:
+            # Reszta mieści się na stronie - jedna zwykła tabela
+            self._table = self._page(len(self.rows))
+            return self._table.wrap(availWidth, availHeight)
+        self._table = None
+        return sum(MEAS_COL_WIDTHS), height
+
+    def split(self, availWidth, availHeight):
+        fit = int((availHeight - self.header_h) // self.row_h)
+        if fit < 1:
+            return []   # następna strona
+        end = self.start + fit
+        if end >= len(self.rows):
+            return [self._page(len(self.rows))]
+        rest = PagedTable(self.make_table, self.header_rows, self.rows, end, (self.header_h, self.row_h))
+        return [self._page(end), rest]
+
+    def draw(self):
+        self._table.drawOn(self.canv, 0, 0)
+
+# --- GENERATOR PDF ---
+
+class EICR_PDF:
+    def __init__(self, buffer, data, paged=None, logo_step=0):
+        # paged: None = automatycznie dla dużych tabel, False = jedna tabela, True = strona po stronie
+        # logo_step: stopień jakości logo z resources.LOGO_STEPS (0 = pełna)
+        self.buffer = buffer
+        self.data = data
+        self.paged = paged
+        self.logo_step = logo_step
+        # Strumienie treści kompresowane, czcionki TTF osadzane jako podzbiór użytych znaków
+        self.doc = SimpleDocTemplate(
+            self.buffer, pagesize=A4, pageCompression=1,
+            rightMargin=10*mm, leftMargin=10*mm, topMargin=10*mm, bottomMargin=10*mm
+        )
+        self.tpl = render_template(data.get('column_names'))
+        self.style_header = self.tpl.style_header
+        self.style_subheader = self.tpl.style_subheader
+        self.style_value = self.tpl.style_value
+        self.style_small = self.tpl.style_small
+        self.style_normal = self.tpl.style_normal
+
+    def _measurement_rows(self, df):
+        # Generator wierszy tabeli; ocena liczona hurtowo dla całej tabeli (compliance.evaluate)
+        # Tekst komórek przygotowany kolumnami (schema.column_text): float32 bez "0.2199999",
+        # puste komórki bez "nan"/"<NA>"; kolumny tekstowe normalizowane w całości (clean_column)
+        columns = [column_text(df[col]) for col in MEASUREMENT_COLUMNS]
+        for i in TEXT_COLUMNS:
+            columns[i] = clean_column(columns[i])
+        columns.append(clean_column(evaluate(df)[STATUS_COLUMN].tolist()))
+        for row in zip(*columns):
+            yield list(row)
+
+    def _measurement_tables(self, df, header_rows):
+        # Duże tabele składane strona po stronie (PagedTable), małe - jedna Table
+        paged = self.paged
+        if paged is None:
+            paged = len(df) > MEAS_PAGED_THRESHOLD
+        count("pdf.rows", len(df))
+        rows = list(self._measurement_rows(df))
+        if paged and rows:
+            return [PagedTable(self._measurement_table, header_rows, rows)]
+        return [self._measurement_table(header_rows + rows)]
+
+    def _measurement_table(self, table_data):
+        t_meas = Table(table_data, colWidths=MEAS_COL_WIDTHS, repeatRows=2)
+        t_meas.setStyle(self.tpl.measurement_style)
+        return t_meas
+
+    def _header_elements(self):
+        # Sekcje 1-3: nagłówek, dane zlecenia, przyrząd
+        elements = []
+        tpl = self.tpl
+
+        # 1. LOGO I NAGŁÓWEK
+        logo_img = tpl.no_logo
+        logo = logo_image(*LOGO_STEPS[self.logo_step])
+        if logo:
+            logo_bytes, aspect = logo
+            logo_img = Image(BytesIO(logo_bytes), width=LOGO_WIDTH, height=LOGO_WIDTH * aspect)
+
+        t_head = Table([[logo_img, tpl.title]], colWidths=[50*mm, 140*mm])
+        t_head.setStyle(tpl.head_style)
+        elements.append(t_head)
+        elements.append(Spacer(1, 2*mm))
+
+        # 2. DANE ZLECENIA
+        meta = self.data['meta']
+        labels = tpl.info_labels
+        info_data = [
+            [labels['ZLECENIODAWCA:'], Paragraph(clean_text(meta['klient']), self.style_value),
+             labels['OBIEKT:'], Paragraph(clean_text(meta['obiekt']), self.style_value)],
+            [labels['DATA BADANIA:'], Paragraph(str(meta['data']), self.style_value),
+             labels['PROTOKÓŁ NR:'], Paragraph(clean_text(meta['nr_protokolu']), self.style_value)]
+        ]
+        t_info = Table(info_data, colWidths=[30*mm, 65*mm, 30*mm, 65*mm])
+        t_info.setStyle(tpl.info_style)
+        elements.append(t_info)
+        elements.append(Spacer(1, 2*mm))
+
+        # 3. PRZYRZĄD POMIAROWY
+        dev = self.data['device']
+        meter_text = f"<b>Użyty przyrząd:</b> {clean_text(dev['nazwa'])} | <b>Producent:</b> {clean_text(dev['producent'])} | <b>Typ:</b> {clean_text(dev['typ'])} | <b>Nr seryjny:</b> {clean_text(dev['nr_seryjny'])}"
+        
+        t_meter = Table([[Paragraph(meter_text, self.style_small)]], colWidths=[190*mm])
+        t_meter.setStyle(tpl.meter_style)
+        elements.append(t_meter)
+        elements.append(Spacer(1, 3*mm))
+        return elements
+
+    def _supply_elements(self):
+        elements = []
+        tpl = self.tpl
+
+        # 4. ZASILANIE I UZIEMIENIE (GRID LAYOUT)
+        elements.append(tpl.supply_title)
+        supply = self.data['supply']
+        
+        cell_L = tpl.supply_labels.__getitem__
+        def cell_V(txt): return Paragraph(clean_text(txt), self.style_value)
+
+        supply_data = [
+            [cell_L("Układ sieci"), cell_V(supply['uklad']), cell_L("Napięcie"), cell_V(f"{supply['napiecie']} V")],
+            [cell_L("Uziom"), cell_V(supply['uziom_typ']), cell_L("Częstotliwość"), cell_V(f"{supply['czestotliwosc']} Hz")],
+            [cell_L("Rez. Uziomu RA"), cell_V(f"{supply['ra']} Ohm"), cell_L("Zab. Przedlicz."), cell_V(f"{supply['zab_typ']} {supply['zab_prad']}A")],
+            [cell_L("Impedancja Ze"), cell_V(f"{supply['ze']} Ohm"), cell_L("Spodziewany Ipf"), cell_V(f"{supply['ipf']} kA")],
+            [cell_L("Przewód PE"), cell_V(supply['przewod_pe']), cell_L("Wyłącznik Gł."), cell_V(supply['wyl_glowny'])]
+        ]
+        
+        t_supply = Table(supply_data, colWidths=[30*mm, 65*mm, 30*mm, 65*mm])
+        t_supply.setStyle(tpl.supply_style)
+        elements.append(t_supply)
+        
+        bonds = []
+        if supply['bond_woda']: bonds.append("Woda")
+        if supply['bond_gaz']: bonds.append("Gaz")
+        if supply['bond_konstr']: bonds.append("Konstr.")
+        if supply['bond_co']: bonds.append("C.O.")
+        bond_txt = "Brak" if not bonds else ", ".join(bonds)
+        
+        t_bond = Table([[cell_L("Połączenia wyrównawcze główne:"), cell_V(bond_txt)]], colWidths=[60*mm, 130*mm])
+        t_bond.setStyle(tpl.bond_style)
+        elements.append(t_bond)
+        elements.append(Spacer(1, 4*mm))
+        return elements
+
+    def _inspection_elements(self):
+        elements = []
+        tpl = self.tpl
+
+        # 5. OGLĘDZINY
+        elements.append(tpl.inspection_title)
+        insp_df = self.data['inspekcja']
+        insp_items = list(insp_df.items())
+        half = (len(insp_items) + 1) // 2
+        col1_data = insp_items[:half]
+        col2_data = insp_items[half:]
+        
+        insp_rows = []
+        for i in range(len(col1_data)):
+            k1, v1 = col1_data[i]
+            res1 = "POZYTYWNY" if v1 == "POZYTYWNY" else ("NEGATYWNY" if v1 == "NEGATYWNY" else "N/D")
+            c1_txt = f"{clean_text(k1)}: <b>{tpl.inspection_results[res1]}</b>"
+            
+            c2_txt = ""
+            if i < len(col2_data):
+                k2, v2 = col2_data[i]
+                res2 = "POZYTYWNY" if v2 == "POZYTYWNY" else ("NEGATYWNY" if v2 == "NEGATYWNY" else "N/D")
+                c2_txt = f"{clean_text(k2)}: <b>{tpl.inspection_results[res2]}</b>"
+                
+            insp_rows.append([Paragraph(c1_txt, self.style_small), Paragraph(c2_txt, self.style_small)])
+
+        # Pusta lista (np. etap 3 pominięty) - ReportLab nie przyjmuje tabeli bez wierszy
+        if not insp_rows:
+            insp_rows.append([tpl.no_inspection, ""])
+
+        t_insp = Table(insp_rows, colWidths=[95*mm, 95*mm])
+        t_insp.setStyle(tpl.inspection_style)
+        elements.append(t_insp)
+        elements.append(Spacer(1, 4*mm))
+
+        return elements
+
+    def _intro_elements(self):
+        # Sekcje 1-5: nagłówek, dane zlecenia, przyrząd, zasilanie, oględziny
+        return self._header_elements() + self._supply_elements() + self._inspection_elements()
+
+    def _table_elements(self, table_name, df):
+        # 6. TABELE POMIAROWE (jedna rozdzielnica)
+        elements = [Paragraph(clean_text(f"III. WYNIKI POMIARÓW: {table_name}"), self.style_subheader)]
+        elements.extend(self._measurement_tables(df, self.tpl.measurement_header))
+        elements.append(Spacer(1, 5*mm))
+        return elements
+
+    def _trend_elements(self):
+        # III.a PORÓWNANIE Z POPRZEDNIM BADANIEM - tylko gdy data['trend'] (trend.trend_payload)
+        trend = self.data.get('trend')
+        if not trend:
+            return []
+        prev, summary = trend['previous'], trend['summary']
+        elements = [Paragraph(clean_text(f"III.a PORÓWNANIE Z POPRZEDNIM BADANIEM (protokół {prev['nr_protokolu']} z {prev['data']})"), self.style_subheader)]
+        worse = summary['POGORSZENIE']
+        text = (f"Porównano {summary['porownano']} obwodów: pogorszenie parametrów - <b>{worse}</b>, "
+                f"bez pogorszenia - {summary['BEZ POGORSZENIA']}, nowe - {summary['NOWY']}, nieobecne obecnie - {summary['BRAK']}.")
+        if len(trend['rows']) < worse:
+            text += f" Wykaz obejmuje pierwsze {len(trend['rows'])} obwodów z pogorszeniem."
+        elements.append(Paragraph(clean_text(text), self.style_small))
+        if trend['rows']:
+            def num(value): return "" if value is None else f"{value:g}"
+            names = clean_column([str(r['Nazwa_Obwodu']) for r in trend['rows']])
+            boards = clean_column([str(r['tabela']) for r in trend['rows']])
+            rows = [[board, name] + [num(r[c]) for c in ('R_ISO_prev', 'R_ISO', 'Zs_pom_prev', 'Zs_pom', 'RCD_t_prev', 'RCD_t')]
+                    for board, name, r in zip(boards, names, trend['rows'])]
+            t_trend = Table(self.tpl.trend_header + rows, colWidths=[35*mm, 53*mm] + [17*mm] * 6, repeatRows=2)
+            t_trend.setStyle(self.tpl.trend_style)
+            elements.append(Spacer(1, 2*mm))
+            elements.append(t_trend)
+        elements.append(Spacer(1, 5*mm))
+        return elements
+
+    def _closing_elements(self):
+        elements = []
+        tpl = self.tpl
+        meta = self.data['meta']
+
+        # 7. STOPKA
+        elements.append(Spacer(1, 5*mm))
+        elements.append(tpl.closing_title)
+        
+        orzeczenie = self.data['meta']['orzeczenie']
+        uwagi = self.data['uwagi']
+        
+        t_uwagi = Table([[Paragraph(f"<b>Orzeczenie: {clean_text(orzeczenie)}</b><br/><br/>Uwagi: {clean_text(uwagi)}", self.style_normal)]], colWidths=[190*mm])
+        t_uwagi.setStyle(tpl.uwagi_style)
+        elements.append(t_uwagi)
+        
+        elements.append(Spacer(1, 10*mm))
+        
+        footer_data = [[
+            Paragraph(f"Badanie wykonał:<br/><b>{clean_text(meta['wykonawca'])}</b>", self.style_normal),
+            Paragraph(f"Nr uprawnień:<br/><b>{clean_text(meta['nr_uprawnien'])}</b>", self.style_normal),
+            tpl.signature
+        ]]
+        t_foot = Table(footer_data, colWidths=[63*mm, 63*mm, 64*mm])
+        elements.append(t_foot)
+
+        return elements
+
+    def _tables_elements(self):
+        elements = []
+        for table_name, df in self.data['tables'].items():
+            elements.extend(self._table_elements(table_name, df))
+        return elements
+
+    def sections(self):
+        # Kolejność sekcji dokumentu: (nazwa, funkcja budująca elementy)
+        return [
+            ('header', self._header_elements),
+            ('supply', self._supply_elements),
+            ('inspection', self._inspection_elements),
+            ('measurements', self._tables_elements),
+            ('trend', self._trend_elements),
+            ('footer', self._closing_elements),
+        ]
+
+    def generate(self):
+        # Odcinki pdf.<sekcja> (budowa elementów) i pdf.build (skład) - profiling.py
+        elements = []
+        for name, build in self.sections():
+            with span(f"pdf.{name}"):
+                elements.extend(build())
+        with span("pdf.build"):
+            self.doc.build(elements, canvasmaker=NumberedCanvas)
+
+# --- ZAPIS DO PLIKU I ROZMIAR DOCELOWY ---
+PDF_TARGET_SIZE = int(os.environ.get("FARAD_PDF_TARGET_KB") or 0) * 1024   # 0 = bez limitu
+
+def logo_step_for(size, target_size):
+    # Stopień logo, przy którym PDF o rozmiarze `size` zmieści się w `target_size`.
+    # Logo JPEG osadzane jest bez zmian, więc zysk z każdego stopnia znany jest z góry -
+    # wystarczy co najwyżej jeden ponowny skład. 0 = bez zmian; gdy żaden stopień
+    # nie wystarcza - najmniejsze logo (najbliżej celu).
+    logo = logo_image(*LOGO_STEPS[0])
+    if not target_size or size <= target_size or not logo:
+        return 0
+    for step in range(1, len(LOGO_STEPS)):
+        if size - len(logo[0]) + len(logo_image(*LOGO_STEPS[step])[0]) <= target_size:
+            return step
+    return len(LOGO_STEPS) - 1
+
+def _write_file(data, path, paged, logo_step):
+    with open(path, 'wb') as fh:
+        EICR_PDF(fh, data, paged, logo_step).generate()
+    return os.path.getsize(path)
+
+def write_pdf(data, path, paged=None, target_size=PDF_TARGET_SIZE):
+    # PDF zapisywany prosto do pliku - bez bufora i jego kopii w pamięci. Zwraca rozmiar.
+    tmp = temp_path(path)
+    try:
+        size = _write_file(data, tmp, paged, 0)
+        step = logo_step_for(size, target_size)
+        if step:
+            with span("pdf.shrink"):
+                size = _write_file(data, tmp, paged, step)
+        os.replace(tmp, path)
+    except BaseException:
+        os.remove(tmp)
+        raise
+    count("pdf.bytes", size)
+    return size
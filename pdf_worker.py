@@ -0,0 +1,4 @@
+# --- PROCES ROBOCZY PULI PDF ---
+# Moduł startowy procesów fragments.get_pool() - wykonywany jako __mp_main__ zamiast app.py.
+# Celowo bez importów: render_fragment / write_pdf ładują swoje moduły przy pierwszym zadaniu,
+# więc proces nie wczytuje streamlit ani archiwum (store) i nie wykonuje set_page_config.
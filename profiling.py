@@ -0,0 +1,106 @@
+# --- DIAGNOSTYKA WYDAJNOŚCI (opcjonalna) ---
+# Włączana zmienną środowiskową FARAD_PROFILE=1. Każdy przebieg (rerun Streamlit, raport wsadowy)
+# to jeden ślad: odcinki czasu (span) i liczniki, zapisywane jako jedna linia JSON
+# w logu "farad.profile" (stderr albo plik z FARAD_PROFILE_LOG).
+# Wyłączona kosztuje tylko odczyt zmiennej kontekstowej na odcinek.
+import json
+import logging
+import os
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime
+
+ENABLED = os.environ.get("FARAD_PROFILE", "").lower() not in ("", "0", "false", "nie")
+LOG_PATH = os.environ.get("FARAD_PROFILE_LOG", "")
+
+logger = logging.getLogger("farad.profile")
+_current = ContextVar("farad_trace", default=None)   # osobno dla każdego wątku/sesji
+
+if ENABLED and not logger.handlers:
+    handler = logging.FileHandler(LOG_PATH, encoding='utf-8') if LOG_PATH else logging.StreamHandler()
+    handler.setFormatter(logging.Formatter("%(message)s"))
+    logger.addHandler(handler)
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+
+class Trace:
+    def __init__(self, name, fields):
+        self.name = name
+        self.fields = dict(fields)
+        self.spans = []       # [nazwa, głębokość, ms] w kolejności rozpoczęcia
+        self.counters = {}
+        self.depth = 0
+        self.started = datetime.now()
+        self.duration_ms = None
+
+    def to_dict(self):
+        return {
+            'ts': self.started.isoformat(timespec='milliseconds'),
+            'trace': self.name, **self.fields,
+            'ms': self.duration_ms,
+            'spans': [{'name': n, 'depth': d, 'ms': ms} for n, d, ms in self.spans],
+            'counters': self.counters,
+        }
+
+@contextmanager
+def trace(name, force=False, **fields):
+    # Zwraca Trace albo None (diagnostyka wyłączona). Zagnieżdżony ślad staje się odcinkiem
+    # bieżącego - np. fragment wykonywany w ramach pełnego przebiegu.
+    if _current.get() is not None:
+        with span(name):
+            yield None
+        return
+    if not (ENABLED or force):
+        yield None
+        return
+    t = Trace(name, fields)
+    token = _current.set(t)
+    start = time.perf_counter()
+    try:
+        yield t
+    finally:
+        t.duration_ms = round((time.perf_counter() - start) * 1000, 2)
+        _current.reset(token)
+        if ENABLED:
+            logger.info(json.dumps(t.to_dict(), ensure_ascii=False, default=str))
+
+@contextmanager
+def span(name):
+    t = _current.get()
+    if t is None:
+        yield
+        return
+    record = [name, t.depth, None]
+    t.spans.append(record)
+    t.depth += 1
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        t.depth -= 1
+        record[2] = round((time.perf_counter() - start) * 1000, 2)
+
+def count(name, n=1):
+    t = _current.get()
+    if t is not None:
+        t.counters[name] = t.counters.get(name, 0) + n
+
+def record(name, ms, children=()):
+    # Odcinek zmierzony poza bieżącym przebiegiem (zlecenie w tle) razem ze śladami
+    # z procesów puli (Trace.to_dict) - ich odcinki o poziom głębiej, liczniki sumowane
+    t = _current.get()
+    if t is None:
+        return
+    t.spans.append([name, t.depth, ms])
+    for child in children:
+        t.spans.append([child['trace'], t.depth + 1, child['ms']])
+        t.spans.extend([s['name'], t.depth + 2 + s['depth'], s['ms']] for s in child['spans'])
+        for key, n in child['counters'].items():
+            t.counters[key] = t.counters.get(key, 0) + n
+
+def annotate(**fields):
+    # Dodatkowe pola bieżącego śladu (np. etap menu znany dopiero w trakcie przebiegu)
+    t = _current.get()
+    if t is not None:
+        t.fields.update(fields)
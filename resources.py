@@ -0,0 +1,124 @@
+# --- WSPÓLNE ZASOBY PDF (raz na proces serwera) ---
+# Streamlit wykonuje app.py od nowa przy każdej interakcji, ale importowane
+# moduły zostają w pamięci - dlatego cache zasobów mieszka tutaj.
+# ReportLab i PIL importowane są dopiero przy pierwszym użyciu - app.py importuje
+# ten moduł przy starcie, a PDF potrzebny jest tylko w etapie "5. Generuj PDF".
+import os
+from functools import lru_cache
+from io import BytesIO
+
+from reportlab.lib.units import mm
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+FONT_PATH = os.path.join(BASE_DIR, "font.ttf")
+LOGO_PATH = os.path.join(BASE_DIR, "logo.png")
+
+PRIMARY_COLOR = "#003366"
+
+LOGO_WIDTH = 40*mm
+LOGO_DPI = 300
+LOGO_JPEG_QUALITY = 85
+# Kolejne stopnie jakości logo przy przekroczeniu docelowego rozmiaru PDF: (dpi, jakość JPEG)
+LOGO_STEPS = [(LOGO_DPI, LOGO_JPEG_QUALITY), (200, 80), (150, 75), (100, 70)]
+SIDEBAR_LOGO_PX = 200   # 2x szerokości w panelu bocznym (ekrany HiDPI)
+
+def font_available():
+    # Bez parsowania TTF - do komunikatu w interfejsie
+    return os.path.exists(FONT_PATH)
+
+@lru_cache(maxsize=None)
+def register_fonts():
+    # Zwraca (font, font_bold, czy_polskie_znaki). Plik TTF parsowany jest raz;
+    # font.ttf nie ma osobnego kroju pogrubionego, więc bold = ten sam krój.
+    if os.path.exists(FONT_PATH):
+        try:
+            from reportlab.pdfbase import pdfmetrics
+            from reportlab.pdfbase.ttfonts import TTFont
+            pdfmetrics.registerFont(TTFont('CustomFont', FONT_PATH))
+            return 'CustomFont', 'CustomFont', True
+        except Exception:
+            pass
+    return 'Helvetica', 'Helvetica-Bold', False
+
+@lru_cache(maxsize=None)
+def logo_image(dpi=LOGO_DPI, quality=LOGO_JPEG_QUALITY):
+    # Logo przeskalowane do rozmiaru wydruku (40 mm) jako JPEG na białym tle.
+    # ReportLab osadza JPEG bez zmian (DCTDecode); PNG rozpakowuje do surowych pikseli
+    # z osobną maską alfa - przy 300 dpi to ~190 KB zamiast ~35 KB na każdy PDF.
+    # Zwraca (bajty obrazu, proporcja wys/szer) albo None, gdy brak pliku.
+    if not os.path.exists(LOGO_PATH):
+        return None
+    try:
+        from PIL import Image as PILImage
+        with PILImage.open(LOGO_PATH) as img:
+            img.load()
+            aspect = img.height / float(img.width)
+            target_px = int(round(LOGO_WIDTH / 72.0 * dpi))
+            if img.width > target_px:
+                img = img.resize((target_px, max(1, int(round(target_px * aspect)))), PILImage.LANCZOS)
+            rgba = img.convert("RGBA")
+            flat = PILImage.new("RGB", rgba.size, "white")
+            flat.paste(rgba, mask=rgba.getchannel("A"))
+            out = BytesIO()
+            flat.save(out, format="JPEG", quality=quality, optimize=True)
+        return out.getvalue(), aspect
+    except Exception:
+        pass
+    try:
+        from reportlab.lib.utils import ImageReader
+        iw, ih = ImageReader(LOGO_PATH).getSize()
+        with open(LOGO_PATH, "rb") as f:
+            return f.read(), ih / float(iw)
+    except Exception:
+        return None
+
+@lru_cache(maxsize=None)
+def sidebar_logo():
+    # Miniatura do panelu bocznego - bez ReportLab i bez kosztownej optymalizacji PNG
+    if not os.path.exists(LOGO_PATH):
+        return None
+    try:
+        from PIL import Image as PILImage
+        with PILImage.open(LOGO_PATH) as img:
+            img.thumbnail((SIDEBAR_LOGO_PX, SIDEBAR_LOGO_PX))
+            out = BytesIO()
+            img.save(out, format="PNG")
+        return out.getvalue()
+    except Exception:
+        with open(LOGO_PATH, "rb") as f:
+            return f.read()
+
+@lru_cache(maxsize=None)
+def pdf_styles(font_name, font_bold, primary_color):
+    from reportlab.lib import colors
+    from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+    base = getSampleStyleSheet()
+    return {
+        # 1. Nagłówek Główny
+        'header': ParagraphStyle(
+            'FaradHeader', parent=base['Heading1'], fontName=font_bold,
+            fontSize=14, textColor=colors.HexColor(primary_color), spaceAfter=5
+        ),
+        # 2. Podtytuły sekcji (Biały tekst na granatowym tle)
+        'subheader': ParagraphStyle(
+            'FaradSub', parent=base['Heading2'], fontName=font_bold,
+            fontSize=10, textColor=colors.white, backColor=colors.HexColor(primary_color),
+            leading=14, spaceBefore=6, spaceAfter=0, borderPadding=2
+        ),
+        # 3. Etykiety w tabelach (Bold)
+        'label': ParagraphStyle(
+            'FaradLabel', parent=base['Normal'], fontName=font_bold, fontSize=8, leading=10
+        ),
+        # 4. Wartości w tabelach
+        'value': ParagraphStyle(
+            'FaradValue', parent=base['Normal'], fontName=font_name, fontSize=8, leading=10
+        ),
+        # 5. Mały tekst (np. listy kontrolne)
+        'small': ParagraphStyle(
+            'FaradSmall', parent=base['Normal'], fontName=font_name, fontSize=7, leading=9
+        ),
+        # 6. Normalny tekst
+        'normal': ParagraphStyle(
+            'FaradNormal', parent=base['Normal'], fontName=font_name, fontSize=9, leading=11
+        ),
+    }
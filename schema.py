@@ -0,0 +1,77 @@
+# --- TYPY KOLUMN TABEL POMIAROWYCH ---
+# Stały schemat zamiast typów zgadywanych przez pandas (object, int64/float64 zależnie od danych):
+# powtarzalne wartości (przewód, typ zabezpieczenia) jako kategorie, pomiary float32,
+# prąd zabezpieczenia Int16, nazwy obwodów w buforze Arrow. Tabela w sesji zajmuje kilka razy
+# mniej pamięci, a memory_usage(deep=True) nie musi przechodzić po obiektach Pythona.
+import numpy as np
+import pandas as pd
+
+from compliance import MEASUREMENT_COLUMNS, to_numeric
+
+TEXT = pd.StringDtype("pyarrow")
+CATEGORY = "category"
+INT16_MAX = np.iinfo(np.int16).max
+NUMBER_PATTERN = r'(-?\d+(?:\.\d+)?)'
+
+SCHEMA = {
+    "Nazwa_Obwodu": TEXT,
+    "Typ_Przewodu": CATEGORY,
+    "Przekroj": "float32",
+    "Zab_Typ": CATEGORY,
+    "Zab_In": "Int16",
+    "R_ISO": "float32",
+    "Zs_pom": "float32",
+    "Zs_dop": "float32",
+    "RCD_t": "float32",
+}
+
+def parse_number(col):
+    # Kolumna -> float64; tekst z jednostką lub znakiem daje pierwszą liczbę (">999 MΩ" -> 999,
+    # "0,22 Ω" -> 0.22) zamiast NaN. Wyrażenie regularne tylko dla komórek, których nie czyta to_numeric
+    values = to_numeric(col)
+    missing = np.isnan(values) & col.notna().to_numpy()
+    if missing.any():
+        values = values.copy()   # to_numeric może zwrócić widok tylko do odczytu
+        text = col[missing].astype(str).str.replace(',', '.', regex=False)
+        values[missing] = pd.to_numeric(text.str.extract(NUMBER_PATTERN, expand=False), errors='coerce')
+    return values
+
+def _convert(col, dtype):
+    if dtype is TEXT or dtype == CATEGORY:
+        text = col.astype(TEXT)
+        return text.astype(CATEGORY) if dtype == CATEGORY else text
+    values = parse_number(col)
+    if dtype == "Int16":
+        values = np.round(values)
+        values[np.abs(values) > INT16_MAX] = np.nan   # poza zakresem - jak wartość nieczytelna
+        return pd.Series(pd.array(values, dtype="Int16"), index=col.index)
+    return pd.Series(values.astype(dtype), index=col.index)
+
+def conform(df):
+    # Tabela w schemacie SCHEMA (kolumny w kolejności MEASUREMENT_COLUMNS, brakujące puste).
+    # Kolumny już zgodne nie są kopiowane - wywołanie po każdej edycji jest tanie.
+    if list(df.columns) != MEASUREMENT_COLUMNS:
+        df = df.reindex(columns=MEASUREMENT_COLUMNS)
+    if all(df[col].dtype == dtype for col, dtype in SCHEMA.items()):
+        return df
+    return pd.DataFrame({
+        col: df[col] if df[col].dtype == dtype else _convert(df[col], dtype)
+        for col, dtype in SCHEMA.items()
+    }, index=df.index)
+
+def editable(df):
+    # Widok dla st.data_editor: kategorie jako tekst, bo edytor nie dopisuje nowych kategorii
+    # (przewód i zabezpieczenie wpisywane są dowolnym tekstem)
+    cats = [col for col in df.columns if isinstance(df[col].dtype, pd.CategoricalDtype)]
+    return df.astype({col: TEXT for col in cats}) if cats else df
+
+def column_text(col):
+    # Tekst komórek do PDF: liczby w zapisie najkrótszym dla swojego typu (float32 0.22 -> "0.22",
+    # 16.0 -> "16"), puste komórki -> ""
+    text = col.astype(TEXT)
+    if pd.api.types.is_float_dtype(col.dtype):
+        text = text.str.replace(r'\.0$', '', regex=True)
+    return text.fillna('').tolist()
+
+def frame_bytes(df):
+    return int(df.memory_usage(deep=True).sum())
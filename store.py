@@ -0,0 +1,247 @@
+# --- ARCHIWUM PROTOKOŁÓW ---
+# Metadane w SQLite (indeksy + wyszukiwanie pełnotekstowe FTS5), tabele pomiarowe
+# w osobnych plikach Parquet. Zapis przyrostowy: tylko to, co zmieniło się od ostatniego razu.
+import json
+import os
+import sqlite3
+import hashlib
+from collections.abc import MutableMapping
+from contextlib import closing
+from datetime import datetime
+from functools import lru_cache
+
+import pandas as pd
+
+from payload import meta_hash, table_hash
+from files import temp_path
+from schema import conform
+
+DATA_DIR = os.environ.get("FARAD_DATA_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "dane"))
+SEARCH_LIMIT = 50
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS protokoly (
+    id INTEGER PRIMARY KEY,
+    nr_protokolu TEXT, klient TEXT, obiekt TEXT, data TEXT,
+    dane TEXT NOT NULL DEFAULT '{}',
+    zmieniono TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS ix_protokoly_nr ON protokoly(nr_protokolu);
+CREATE INDEX IF NOT EXISTS ix_protokoly_klient ON protokoly(klient);
+CREATE INDEX IF NOT EXISTS ix_protokoly_obiekt ON protokoly(obiekt);
+CREATE INDEX IF NOT EXISTS ix_protokoly_data ON protokoly(data);
+CREATE INDEX IF NOT EXISTS ix_protokoly_zmieniono ON protokoly(zmieniono);
+CREATE TABLE IF NOT EXISTS tabele (
+    protokol_id INTEGER NOT NULL REFERENCES protokoly(id) ON DELETE CASCADE,
+    nazwa TEXT NOT NULL,
+    pozycja INTEGER NOT NULL,
+    plik TEXT NOT NULL,
+    wiersze INTEGER NOT NULL,
+    PRIMARY KEY (protokol_id, nazwa)
+);
+"""
+# Trigramy pozwalają szukać fragmentu tekstu ("Testowa") z użyciem indeksu
+FTS_SCHEMA = "CREATE VIRTUAL TABLE IF NOT EXISTS protokoly_fts USING fts5(nr_protokolu, klient, obiekt, data, tokenize='trigram')"
+SEARCH_COLUMNS = ['nr_protokolu', 'klient', 'obiekt', 'data']
+READING_COLUMNS = ['Nazwa_Obwodu', 'R_ISO', 'Zs_pom', 'RCD_t']   # historia obwodów (trend.py)
+
+class ProtocolStore:
+    def __init__(self, path=DATA_DIR):
+        self.path = path
+        self.db_path = os.path.join(path, "protokoly.db")
+        os.makedirs(os.path.join(path, "tabele"), exist_ok=True)
+        with closing(self._connect()) as con, con:
+            con.execute("PRAGMA journal_mode=WAL")
+            con.executescript(SCHEMA)
+            # Archiwa sprzed przycinania w save_meta - previous_protocols porównuje obiekt wprost (indeks)
+            con.execute("UPDATE protokoly SET obiekt=trim(obiekt) WHERE obiekt != trim(obiekt)")
+            try:
+                con.execute(FTS_SCHEMA)
+                self.has_fts = True
+            except sqlite3.OperationalError:
+                self.has_fts = False
+
+    def _connect(self):
+        # Osobne połączenie na operację - sesje Streamlit działają w różnych wątkach
+        con = sqlite3.connect(self.db_path, timeout=10)
+        con.execute("PRAGMA foreign_keys=ON")
+        return con
+
+    def _table_path(self, protocol_id, name):
+        digest = hashlib.sha1(str(name).encode('utf-8')).hexdigest()[:16]
+        return os.path.join(self.path, "tabele", str(protocol_id), digest + ".parquet")
+
+    # --- zapis ---
+    def create(self):
+        with closing(self._connect()) as con, con:
+            return con.execute("INSERT INTO protokoly (zmieniono) VALUES (?)", (datetime.now().isoformat(timespec='seconds'),)).lastrowid
+
+    def save_meta(self, protocol_id, data):
+        meta = data.get('meta', {})
+        row = [str(meta.get(c, '') or '').strip() for c in SEARCH_COLUMNS]
+        dane = json.dumps({k: v for k, v in data.items() if k != 'tables'}, default=str, ensure_ascii=False)
+        with closing(self._connect()) as con, con:
+            con.execute(
+                "UPDATE protokoly SET nr_protokolu=?, klient=?, obiekt=?, data=?, dane=?, zmieniono=? WHERE id=?",
+                (*row, dane, datetime.now().isoformat(timespec='seconds'), protocol_id))
+            if self.has_fts:
+                con.execute("DELETE FROM protokoly_fts WHERE rowid=?", (protocol_id,))
+                con.execute("INSERT INTO protokoly_fts (rowid, nr_protokolu, klient, obiekt, data) VALUES (?, ?, ?, ?, ?)", (protocol_id, *row))
+
+    def save_table(self, protocol_id, name, df, position):
+        path = self._table_path(protocol_id, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = temp_path(path)   # dwie sesje mogą zapisywać ten sam protokół jednocześnie
+        try:
+            try:
+                df.to_parquet(tmp, index=False)
+            except (TypeError, ValueError):
+                # Kolumny z mieszanymi typami (np. po edycji) - zapisz jako tekst
+                df.astype({c: str for c in df.columns if df[c].dtype == object}).to_parquet(tmp, index=False)
+            os.replace(tmp, path)
+        except BaseException:
+            os.remove(tmp)
+            raise
+        with closing(self._connect()) as con, con:
+            con.execute(
+                "INSERT OR REPLACE INTO tabele (protokol_id, nazwa, pozycja, plik, wiersze) VALUES (?, ?, ?, ?, ?)",
+                (protocol_id, name, position, os.path.relpath(path, self.path), len(df)))
+
+    def sync_tables(self, protocol_id, names):
+        # Kolejność tabel i usunięcie tych, których nie ma już w protokole
+        with closing(self._connect()) as con, con:
+            stored = [r[0] for r in con.execute("SELECT nazwa FROM tabele WHERE protokol_id=?", (protocol_id,))]
+            for name in stored:
+                if name not in names:
+                    con.execute("DELETE FROM tabele WHERE protokol_id=? AND nazwa=?", (protocol_id, name))
+                    path = self._table_path(protocol_id, name)
+                    if os.path.exists(path):
+                        os.remove(path)
+            con.executemany("UPDATE tabele SET pozycja=? WHERE protokol_id=? AND nazwa=?",
+                            [(i, protocol_id, name) for i, name in enumerate(names)])
+
+    def save_protocol(self, protocol_id, data, saved=None):
+        # Zapis przyrostowy. `saved` to skróty z poprzedniego zapisu; zwraca nowe skróty.
+        # Tabele jeszcze nie wczytane z archiwum (LazyTables) są z definicji niezmienione.
+        saved = saved or {'meta': None, 'tables': {}}
+        tables = data['tables']
+        lazy = isinstance(tables, LazyTables)
+        loaded = tables.loaded() if lazy else tables
+        names = list(tables)
+
+        new = {'meta': meta_hash(data), 'tables': {}}
+        if new['meta'] != saved['meta']:
+            self.save_meta(protocol_id, data)
+        for position, name in enumerate(names):
+            if name not in loaded:
+                new['tables'][name] = saved['tables'].get(name)
+                continue
+            h = table_hash(loaded[name])
+            previous = saved['tables'].get(name) or (tables.load_hashes.get(name) if lazy else None)
+            if h != previous:
+                self.save_table(protocol_id, name, loaded[name], position)
+            new['tables'][name] = h
+        if names != list(saved['tables']):
+            self.sync_tables(protocol_id, names)
+        return new
+
+    # --- odczyt ---
+    def search(self, text='', limit=SEARCH_LIMIT):
+        text = (text or '').strip()
+        cols = "p.id, p.nr_protokolu, p.klient, p.obiekt, p.data, p.zmieniono"
+        with closing(self._connect()) as con:
+            if not text:
+                sql, params = f"SELECT {cols} FROM protokoly p ORDER BY p.zmieniono DESC LIMIT ?", (limit,)
+            elif self.has_fts and len(text) >= 3:
+                phrase = '"' + text.replace('"', '""') + '"'
+                sql = f"SELECT {cols} FROM protokoly_fts f JOIN protokoly p ON p.id = f.rowid WHERE protokoly_fts MATCH ? ORDER BY p.zmieniono DESC LIMIT ?"
+                params = (phrase, limit)
+            else:
+                like = f"%{text}%"
+                sql = f"SELECT {cols} FROM protokoly p WHERE " + " OR ".join(f"p.{c} LIKE ?" for c in SEARCH_COLUMNS) + " ORDER BY p.zmieniono DESC LIMIT ?"
+                params = (*[like] * len(SEARCH_COLUMNS), limit)
+            return pd.read_sql_query(sql, con, params=params)
+
+    def load_meta(self, protocol_id):
+        with closing(self._connect()) as con:
+            row = con.execute("SELECT dane FROM protokoly WHERE id=?", (protocol_id,)).fetchone()
+        if row is None:
+            raise KeyError(protocol_id)
+        return json.loads(row[0])
+
+    def table_names(self, protocol_id):
+        with closing(self._connect()) as con:
+            return [r[0] for r in con.execute("SELECT nazwa FROM tabele WHERE protokol_id=? ORDER BY pozycja", (protocol_id,))]
+
+    def load_table(self, protocol_id, name):
+        # Archiwa sprzed schematu (object/int64) dostają typy schema.SCHEMA przy odczycie
+        return conform(pd.read_parquet(self._table_path(protocol_id, name)))
+
+    # --- historia obiektu (badania okresowe, trend.py) ---
+    def previous_protocols(self, obiekt, exclude=None, before=None):
+        # Wcześniejsze protokoły tego samego obiektu, najnowszy pierwszy.
+        # `before` (data badania, ISO) pomija protokoły z tą samą lub późniejszą datą.
+        sql = "SELECT id, nr_protokolu, data, zmieniono FROM protokoly WHERE obiekt = ? AND id != ?"
+        params = [str(obiekt or '').strip(), exclude or -1]
+        if before:
+            sql += " AND data < ?"
+            params.append(before)
+        with closing(self._connect()) as con:
+            return pd.read_sql_query(sql + " ORDER BY data DESC, id DESC", con, params=params)
+
+    def readings(self, protocol_ids, columns=READING_COLUMNS):
+        # Odczyty obwodów wskazanych protokołów w jednej tabeli kolumnowej
+        # (protokol_id, tabela + `columns`); z plików Parquet czytane są tylko potrzebne kolumny
+        ids = [int(i) for i in protocol_ids]
+        if not ids:
+            return pd.DataFrame(columns=['protokol_id', 'tabela', *columns])
+        with closing(self._connect()) as con:
+            rows = con.execute(
+                f"SELECT protokol_id, nazwa FROM tabele WHERE protokol_id IN ({','.join('?' * len(ids))}) ORDER BY protokol_id, pozycja",
+                ids).fetchall()
+        frames = []
+        for protocol_id, name in rows:
+            path = self._table_path(protocol_id, name)
+            if os.path.exists(path):
+                frames.append(pd.read_parquet(path, columns=columns).assign(protokol_id=protocol_id, tabela=name))
+        if not frames:
+            return pd.DataFrame(columns=['protokol_id', 'tabela', *columns])
+        return pd.concat(frames, ignore_index=True)[['protokol_id', 'tabela', *columns]]
+
+    def open(self, protocol_id):
+        # Metadane od razu, tabele leniwie
+        return self.load_meta(protocol_id), LazyTables(self, protocol_id, self.table_names(protocol_id))
+
+class LazyTables(MutableMapping):
+    # Tabele protokołu z archiwum - plik Parquet czytany dopiero przy pierwszym dostępie
+    def __init__(self, store, protocol_id, names):
+        self._store = store
+        self._id = protocol_id
+        self._data = dict.fromkeys(names)   # None = jeszcze nie wczytana
+        self.load_hashes = {}               # skróty w chwili wczytania - punkt odniesienia autozapisu
+
+    def __getitem__(self, name):
+        df = self._data[name]
+        if df is None:
+            df = self._data[name] = self._store.load_table(self._id, name)
+            self.load_hashes[name] = table_hash(df)
+        return df
+
+    def __setitem__(self, name, df):
+        self._data[name] = df
+
+    def __delitem__(self, name):
+        del self._data[name]
+
+    def __iter__(self):
+        return iter(self._data)
+
+    def __len__(self):
+        return len(self._data)
+
+    def loaded(self):
+        return {name: df for name, df in self._data.items() if df is not None}
+
+@lru_cache(maxsize=None)
+def get_store(path=DATA_DIR):
+    return ProtocolStore(path)
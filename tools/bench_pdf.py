@@ -0,0 +1,178 @@
+# --- BENCHMARK GENEROWANIA PROTOKOŁU (EICR_PDF.generate) ---
+# Użycie:
+#   python tools/bench_pdf.py -o bench.json                    (pełna macierz scenariuszy)
+#   python tools/bench_pdf.py --quick -o bench.json            (szybki zestaw do CI)
+#   python tools/bench_pdf.py --quick --baseline stary.json    (porównanie rozmiarów PDF)
+# Każdy scenariusz (rozdzielnice x obwody x czcionka x logo) działa w osobnym procesie,
+# więc szczytowe RSS dotyczy tylko jego. Dane syntetyczne są deterministyczne (stałe ziarno),
+# więc ten sam kod daje ten sam rozmiar PDF - wzrost ponad tolerancję kończy się kodem 1.
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+from datetime import datetime
+from io import BytesIO
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO)
+
+# (rozdzielnice, obwody łącznie)
+FULL_MATRIX = [(1, 10), (1, 1000), (5, 5000), (20, 10000), (50, 20000), (200, 50000)]
+QUICK_MATRIX = [(1, 10), (1, 500), (10, 2000)]
+SEED = 60364
+SIZE_TOLERANCE = 0.05
+
+NAMES = ["Oświetlenie", "Gniazda łazienka", "Kuchenka", "Pralka", "Zmywarka", "Klimatyzacja", "Gniazda pokój", "Bojler"]
+PROTECTIONS = [("B", 10), ("B", 16), ("B", 20), ("C", 16), ("C", 25), ("gG", 25), ("gG", 32)]
+
+def make_payload(boards, circuits, seed=SEED):
+    import numpy as np
+    import pandas as pd
+    from limits import zs_dop
+    from payload import normalize_payload
+
+    rng = np.random.default_rng(seed)
+    per_board = np.full(boards, circuits // boards)
+    per_board[:circuits % boards] += 1
+    tables = {}
+    for b, n in enumerate(per_board):
+        prot = [PROTECTIONS[i] for i in rng.integers(0, len(PROTECTIONS), n)]
+        zab_typ = [p[0] for p in prot]
+        zab_in = [p[1] for p in prot]
+        tables[f"Rozdzielnica {b + 1}" if b else "Rozdzielnica Główna"] = pd.DataFrame({
+            "Nazwa_Obwodu": [f"{NAMES[i % len(NAMES)]} {i + 1}" for i in range(n)],
+            "Typ_Przewodu": rng.choice(["YDYp", "YDY", "YKY"], n),
+            "Przekroj": rng.choice([1.5, 2.5, 4.0, 6.0], n),
+            "Zab_Typ": zab_typ,
+            "Zab_In": zab_in,
+            "R_ISO": rng.choice([20, 200, 500, 999], n),
+            "Zs_pom": rng.uniform(0.1, 3.0, n).round(2),
+            "Zs_dop": zs_dop(zab_typ, zab_in),
+            "RCD_t": rng.choice([0, 18, 25, 40], n),
+        })
+    return normalize_payload({
+        'meta': {'klient': "Wspólnota Mieszkaniowa „Słoneczna”", 'obiekt': "ul. Żółkiewskiego 12", 'data': "2026-01-15",
+                 'wykonawca': "Jan Kowalski", 'nr_uprawnien': "E/123/2026", 'nr_protokolu': "1/2026", 'orzeczenie': "POZYTYWNE"},
+        'device': {'nazwa': "Miernik inst.", 'producent': "Sonel", 'typ': "MPI-540", 'nr_seryjny': "AB123456"},
+        'supply': {'uklad': "TN-C-S", 'ipf': "6.0", 'zab_typ': "gG", 'zab_prad': 63, 'uziom_typ': "Fundamentowy",
+                   'ra': "2.5", 'ze': "0.22", 'przewod_pe': "LgY 16mm2", 'wyl_glowny': "FR 100A 3P", 'bond_woda': True, 'bond_gaz': True},
+        'inspekcja': {f"Punkt kontrolny {i + 1}": "POZYTYWNY" for i in range(8)},
+        'tables': tables,
+        'uwagi': "Instalacja wykonana zgodnie z normami.",
+    })
+
+def run_scenario(boards, circuits, font, logo):
+    # Wykonywane w procesie potomnym: wyłączenie czcionki/logo musi nastąpić przed importem pdf_engine
+    import resource
+    import resources
+    if not font:
+        resources.FONT_PATH = os.path.join(REPO, "_brak_font.ttf")
+    if not logo:
+        resources.LOGO_PATH = os.path.join(REPO, "_brak_logo.png")
+    start = time.perf_counter()
+    from pdf_engine import EICR_PDF, HAS_POLISH_FONT
+    from profiling import trace
+    resources.logo_image()
+    # Serwer i tryb wsadowy ładują czcionkę i logo raz na proces - mierzone osobno
+    warmup = time.perf_counter() - start
+
+    data = make_payload(boards, circuits)
+    buffer = BytesIO()
+    with trace("bench", force=True) as t:
+        EICR_PDF(buffer, data).generate()
+    total = t.duration_ms / 1000
+    pdf = buffer.getvalue()
+    # ru_maxrss: kB na Linuksie, bajty na macOS
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    rss_mb = rss / (1024 * 1024) if sys.platform == 'darwin' else rss / 1024
+    return {
+        'boards': boards, 'circuits': circuits, 'font': bool(font and HAS_POLISH_FONT), 'logo': bool(logo),
+        'sections': {name[len("pdf."):]: round(ms / 1000, 4) for name, depth, ms in t.spans if depth == 0},
+        'total_s': round(total, 4),
+        'warmup_s': round(warmup, 4),
+        'peak_rss_mb': round(rss_mb, 1),
+        'pdf_bytes': len(pdf),
+        'pages': pdf.count(b'/Type /Page') - pdf.count(b'/Type /Pages'),
+    }
+
+def scenario_key(r):
+    return f"{r['boards']}x{r['circuits']}|font={int(r['font'])}|logo={int(r['logo'])}"
+
+def run_isolated(boards, circuits, font, logo):
+    cmd = [sys.executable, os.path.abspath(__file__), '--worker', json.dumps([boards, circuits, font, logo])]
+    proc = subprocess.run(cmd, capture_output=True, text=True, cwd=REPO)
+    if proc.returncode != 0:
+        raise RuntimeError(proc.stderr.strip().splitlines()[-1] if proc.stderr.strip() else f"kod {proc.returncode}")
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+def environment():
+    import pandas
+    import reportlab
+    return {
+        'python': platform.python_version(), 'platform': platform.platform(), 'cpu_count': os.cpu_count(),
+        'reportlab': reportlab.Version, 'pandas': pandas.__version__,
+    }
+
+def compare(results, baseline_path, tolerance):
+    # Zwraca listę scenariuszy, w których PDF urósł ponad tolerancję względem pliku bazowego
+    with open(baseline_path, encoding='utf-8') as fh:
+        baseline = {scenario_key(r): r for r in json.load(fh)['results']}
+    regressions = []
+    for r in results:
+        old = baseline.get(scenario_key(r))
+        if old and r['pdf_bytes'] > old['pdf_bytes'] * (1 + tolerance):
+            regressions.append((scenario_key(r), old['pdf_bytes'], r['pdf_bytes']))
+    return regressions
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark EICR_PDF.generate()")
+    parser.add_argument('-o', '--output', default='bench_pdf.json', help="plik wynikowy JSON")
+    parser.add_argument('--quick', action='store_true', help="mały zestaw scenariuszy")
+    parser.add_argument('--matrix', help="własne scenariusze, np. 1x100,10x5000")
+    parser.add_argument('--no-variants', action='store_true', help="tylko z czcionką i logo")
+    parser.add_argument('--baseline', help="poprzedni plik JSON do porównania rozmiarów PDF")
+    parser.add_argument('--tolerance', type=float, default=SIZE_TOLERANCE, help="dopuszczalny wzrost rozmiaru (ułamek)")
+    parser.add_argument('--worker', help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.worker:
+        print(json.dumps(run_scenario(*json.loads(args.worker))))
+        return 0
+
+    if args.matrix:
+        matrix = [tuple(int(x) for x in item.split('x')) for item in args.matrix.split(',')]
+    else:
+        matrix = QUICK_MATRIX if args.quick else FULL_MATRIX
+    variants = [(True, True)] if args.no_variants else [(True, True), (True, False), (False, True), (False, False)]
+
+    results, failed = [], 0
+    for boards, circuits in matrix:
+        for font, logo in variants:
+            try:
+                r = run_isolated(boards, circuits, font, logo)
+            except RuntimeError as e:
+                failed += 1
+                print(f"BŁĄD {boards}x{circuits} font={font} logo={logo}: {e}", file=sys.stderr)
+                continue
+            results.append(r)
+            print(f"{scenario_key(r):<32} {r['total_s']:>8.2f} s  {r['pages']:>5} str.  "
+                  f"{r['pdf_bytes'] / 1024:>9.1f} KB  RSS {r['peak_rss_mb']:>7.1f} MB")
+
+    report = {'created': datetime.now().isoformat(timespec='seconds'), 'environment': environment(), 'results': results}
+    with open(args.output, 'w', encoding='utf-8') as fh:
+        json.dump(report, fh, ensure_ascii=False, indent=1)
+    print(f"Zapisano {len(results)} wyników: {args.output}")
+
+    if args.baseline:
+        regressions = compare(results, args.baseline, args.tolerance)
+        for key, old, new in regressions:
+            print(f"REGRESJA {key}: {old} -> {new} B (+{(new / old - 1) * 100:.1f}%)", file=sys.stderr)
+        if regressions:
+            return 1
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,242 @@
+# --- TEST OBCIĄŻENIOWY (równoległe sesje) ---
+# Użycie:
+#   python tools/load_test.py                                  (1, 2, 4, 8 sesji)
+#   python tools/load_test.py --sessions 1,4,16 --rows 2000 -o load.json
+#   python tools/load_test.py --max-p95-ms 500                 (kod 1 po przekroczeniu)
+# Każda sesja to osobny AppTest (Streamlit w procesie, bez sieci) w osobnym wątku - jak
+# użytkownicy jednego serwera: wspólne kolejka PDF, pula procesów i archiwum. Sesja przechodzi
+# etapy 1-5, dostaje syntetyczne tabele (tools/bench_pdf.make_payload), edytuje je
+# i zleca "Generuj PDF". AppTest wykonuje zawsze pełny przebieg skryptu, więc czasy edycji
+# są górnym oszacowaniem (na serwerze edycja komórki przebiega tylko we fragmencie).
+# Przed pomiarami jedna sesja rozgrzewająca (start puli PDF). Archiwum i katalog PDF
+# są tymczasowe, chyba że podano --data-dir.
+import argparse
+import json
+import os
+import platform
+import resource
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO)
+
+STEPS = ["1. Dane Zlecenia", "2. Zasilanie", "3. Oględziny", "4. Pomiary", "5. Generuj PDF"]
+DEFAULT_LEVELS = [1, 2, 4, 8]
+POLL_SECONDS = 0.25
+PDF_TIMEOUT = 600   # s - zlecenie PDF dłuższe niż to liczone jest jako błąd
+
+def rss_mb(pid="self"):
+    # Bieżące RSS z /proc (Linux); gdzie indziej - szczytowe RSS tego procesu
+    try:
+        with open(f"/proc/{pid}/statm") as fh:
+            return int(fh.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+    except (OSError, ValueError):
+        return peak_rss_mb() if pid == "self" else 0.0
+
+def peak_rss_mb():
+    # ru_maxrss: kB na Linuksie, bajty na macOS
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / (1024 * 1024) if sys.platform == 'darwin' else rss / 1024
+
+def workers_rss_mb():
+    import multiprocessing
+    return sum(rss_mb(p.pid) for p in multiprocessing.active_children())
+
+def share_runtime():
+    # AppTest zakłada jeden test naraz: ustawia globalny Runtime._instance na czas przebiegu
+    # i zeruje go na końcu, a app.py kompiluje przy każdym przebiegu od nowa. Przy równoległych
+    # sesjach koniec jednego przebiegu odbierałby runtime pozostałym, a równoległe ast.parse
+    # potrafią się wywrócić (Python 3.11). Jak na serwerze: jeden runtime (ostatni ustawiony)
+    # i jedna pamięć skompilowanego skryptu dla wszystkich sesji.
+    from streamlit.runtime import Runtime
+    from streamlit.runtime.scriptrunner.script_cache import ScriptCache
+    from streamlit.testing.v1 import app_test, local_script_runner
+    script_cache = ScriptCache()
+    script_cache.get_bytecode(os.path.join(REPO, "app.py"))   # kompilacja przed startem wątków
+    app_test.ScriptCache = local_script_runner.ScriptCache = lambda: script_cache
+    last = []
+
+    def instance(cls):
+        if cls._instance is not None:
+            last[:] = [cls._instance]
+            return cls._instance
+        if last:
+            return last[0]
+        raise RuntimeError("Runtime hasn't been created!")
+
+    def exists(cls):
+        return cls._instance is not None or bool(last)
+
+    Runtime.instance = classmethod(instance)
+    Runtime.exists = classmethod(exists)
+
+def percentile(values, q):
+    import numpy as np
+    return round(float(np.percentile(values, q)), 1) if values else None
+
+class Session:
+    # Jeden symulowany inspektor; czasy w ms, błędy jako tekst
+    def __init__(self, name, tables, edits):
+        self.name = name
+        self.tables = tables
+        self.edits = edits
+        self.reruns = []
+        self.pdf = []
+        self.errors = []
+
+    def _run(self, at, label):
+        start = time.perf_counter()
+        at.run()
+        self.reruns.append((time.perf_counter() - start) * 1000)
+        if at.exception:
+            raise RuntimeError(f"{label}: {at.exception[0].value}")
+
+    def scenario(self):
+        from streamlit.testing.v1 import AppTest
+        at = AppTest.from_file(os.path.join(REPO, "app.py"), default_timeout=PDF_TIMEOUT)
+        self._run(at, "start")
+
+        # 1. Dane - obiekt unikalny dla sesji, więc raporty nie trafiają do wspólnego cache PDF
+        for widget in at.text_input:
+            if widget.label == "Obiekt":
+                widget.set_value(self.name)
+            elif widget.label == "Nr protokołu":
+                widget.set_value(f"LT/{self.name}")
+        self._run(at, STEPS[0])
+        for step in STEPS[1:4]:
+            at.sidebar.radio[0].set_value(step)
+            self._run(at, step)
+
+        # 4. Pomiary - tabele podstawiane w stanie sesji, potem edycje pojedynczych komórek
+        at.session_state['tables'] = {name: df.copy() for name, df in self.tables.items()}
+        self._run(at, "tabele")
+        first = next(iter(self.tables))
+        for i in range(self.edits):
+            tables = at.session_state['tables']
+            df = tables[first].copy()
+            df.loc[df.index[i % len(df)], 'Zs_pom'] = 0.1 + (i % 50) / 100
+            tables[first] = df
+            at.session_state['tables'] = tables
+            self._run(at, f"edycja {i + 1}")
+        for button in at.button:
+            if button.label.startswith("Uzupełnij Zs_dop"):
+                button.click()
+                self._run(at, "Zs_dop")
+                break
+
+        # 5. Generuj PDF - czas od kliknięcia do gotowego pliku (odpytywanie jak fragment w aplikacji)
+        at.sidebar.radio[0].set_value(STEPS[4])
+        self._run(at, STEPS[4])
+        start = time.perf_counter()
+        next(b for b in at.button if b.label == "📄 Generuj PDF").click()
+        self._run(at, "Generuj PDF")
+        while 'pdf_job' in at.session_state:
+            if time.perf_counter() - start > PDF_TIMEOUT:
+                raise RuntimeError("PDF: przekroczony czas")
+            time.sleep(POLL_SECONDS)
+            at.run()
+        if at.error:
+            raise RuntimeError(f"PDF: {at.error[0].value}")
+        if not any(b.label == "⬇️ POBIERZ PDF" for b in at.get("download_button")):
+            raise RuntimeError("PDF: brak przycisku pobierania")
+        self.pdf.append((time.perf_counter() - start) * 1000)
+
+    def run(self, barrier):
+        barrier.wait()
+        try:
+            self.scenario()
+        except Exception as e:
+            self.errors.append(f"{type(e).__name__}: {e}")
+
+def make_tables(boards, rows):
+    sys.path.insert(0, os.path.join(REPO, "tools"))
+    from bench_pdf import make_payload
+    return make_payload(boards, rows)['tables']
+
+def run_level(level, tables, edits, tag):
+    sessions = [Session(f"Obiekt testowy {tag}-{level}-{i + 1}", tables, edits) for i in range(level)]
+    barrier = threading.Barrier(level)
+    threads = [threading.Thread(target=s.run, args=(barrier,), name=f"load-{s.name}") for s in sessions]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    wall = time.perf_counter() - start
+    reruns = [ms for s in sessions for ms in s.reruns]
+    pdf = [ms / 1000 for s in sessions for ms in s.pdf]
+    return {
+        'sessions': level,
+        'wall_s': round(wall, 2),
+        'reruns': len(reruns),
+        'rerun_p50_ms': percentile(reruns, 50),
+        'rerun_p95_ms': percentile(reruns, 95),
+        'pdf_p50_s': percentile(pdf, 50),
+        'pdf_p95_s': percentile(pdf, 95),
+        'rss_mb': round(rss_mb(), 1),
+        'peak_rss_mb': round(peak_rss_mb(), 1),
+        'workers_rss_mb': round(workers_rss_mb(), 1),
+        'errors': [f"{s.name}: {e}" for s in sessions for e in s.errors],
+    }
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Test obciążeniowy: równoległe sesje aplikacji (AppTest)")
+    parser.add_argument('--sessions', default=",".join(map(str, DEFAULT_LEVELS)), help="poziomy współbieżności, np. 1,4,16")
+    parser.add_argument('--boards', type=int, default=2, help="rozdzielnic na sesję")
+    parser.add_argument('--rows', type=int, default=200, help="obwodów na sesję (łącznie)")
+    parser.add_argument('--edits', type=int, default=5, help="edycji tabeli na sesję")
+    parser.add_argument('--data-dir', help="archiwum (domyślnie katalog tymczasowy, usuwany po teście)")
+    parser.add_argument('--max-p95-ms', type=float, help="limit p95 przebiegu - kod 1 po przekroczeniu")
+    parser.add_argument('-o', '--output', help="zapis wyniku JSON")
+    args = parser.parse_args(argv)
+    levels = [int(x) for x in args.sessions.split(',')]
+
+    # Zmienne środowiskowe przed importem aplikacji (store/jobs czytają je przy imporcie);
+    # procesy puli PDF (spawn) dziedziczą środowisko i muszą znaleźć moduły repozytorium
+    workdir = tempfile.mkdtemp(prefix="farad_load_")
+    os.environ["FARAD_DATA_DIR"] = args.data_dir or os.path.join(workdir, "dane")
+    os.environ["FARAD_SPOOL_DIR"] = os.path.join(workdir, "pdf")
+    os.environ["PYTHONPATH"] = os.pathsep.join(filter(None, [REPO, os.environ.get("PYTHONPATH")]))
+
+    share_runtime()
+    tables = make_tables(args.boards, args.rows)
+    tag = datetime.now().strftime("%H%M%S")
+    results, failed = [], 0
+    try:
+        # Rozgrzewka (bez zapisu): start puli procesów i importy nie obciążają pierwszego poziomu
+        run_level(1, tables, 0, f"{tag}-rozgrzewka")
+        for level in levels:
+            r = run_level(level, tables, args.edits, tag)
+            results.append(r)
+            failed += len(r['errors'])
+            print(f"{level:>3} sesji  przebieg p50 {r['rerun_p50_ms']:>7} ms  p95 {r['rerun_p95_ms']:>7} ms  "
+                  f"PDF p50 {r['pdf_p50_s']} s  p95 {r['pdf_p95_s']} s  RSS {r['rss_mb']:>6.1f} MB "
+                  f"(+{r['workers_rss_mb']:.1f} MB pula)  {r['wall_s']} s")
+            for error in r['errors']:
+                print(f"  BŁĄD {error}", file=sys.stderr)
+    finally:
+        from fragments import reset_pool
+        reset_pool()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    report = {
+        'created': datetime.now().isoformat(timespec='seconds'),
+        'environment': {'python': platform.python_version(), 'platform': platform.platform(), 'cpu_count': os.cpu_count()},
+        'config': {'boards': args.boards, 'rows': args.rows, 'edits': args.edits},
+        'results': results,
+    }
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as fh:
+            json.dump(report, fh, ensure_ascii=False, indent=1)
+        print(f"Zapisano: {args.output}")
+    if args.max_p95_ms is not None and any((r['rerun_p95_ms'] or 0) > args.max_p95_ms for r in results):
+        return 1
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,73 @@
+# --- POMIAR CZASU PRZEBIEGU (RERUN) EDYTORA POMIARÓW ---
+# Użycie: python tools/rerun_latency.py [--rows 1000 10000] [--repeat 5]
+# "pełny"    - cały skrypt app.py na etapie "4. Pomiary" (tak kończyła się każda edycja komórki)
+# "fragment" - tylko funkcja measurement_editor (przebieg ograniczony do fragmentu)
+# Archiwum (FARAD_DATA_DIR) tymczasowe, usuwane po pomiarze - chyba że ustawione w środowisku.
+import argparse
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+
+from streamlit.testing.v1 import AppTest
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO)
+
+TABLE = "Rozdzielnica Główna"
+
+def make_table(rows):
+    import pandas as pd
+    return pd.DataFrame({
+        "Nazwa_Obwodu": [f"Obwód {i}" for i in range(rows)], "Typ_Przewodu": "YDYp", "Przekroj": 2.5,
+        "Zab_Typ": "B", "Zab_In": 16, "R_ISO": 500, "Zs_pom": 0.8, "Zs_dop": 2.87, "RCD_t": 25,
+    })
+
+def _fragment_script(repo, table):
+    import sys
+    sys.path.insert(0, repo)
+    import app
+    app.init_state()
+    app.measurement_editor(table)
+
+def timed_runs(at, repeat):
+    at.run()  # rozgrzewka
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        at.run()
+        times.append(time.perf_counter() - start)
+    return statistics.median(times)
+
+def measure(rows, repeat):
+    full = AppTest.from_file(os.path.join(REPO, "app.py"), default_timeout=600)
+    full.session_state["tables"] = {TABLE: make_table(rows)}
+    full.run()
+    full.sidebar.radio[0].set_value("4. Pomiary")
+    result = {"pełny": timed_runs(full, repeat)}
+
+    if hasattr(__import__("app"), "measurement_editor"):
+        frag = AppTest.from_function(_fragment_script, args=(REPO, TABLE), default_timeout=600)
+        frag.session_state["tables"] = {TABLE: make_table(rows)}
+        result["fragment"] = timed_runs(frag, repeat)
+    return result
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Czas przebiegu edytora pomiarów")
+    parser.add_argument("--rows", type=int, nargs="+", default=[1000, 10000])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args(argv)
+    # Przed pierwszym przebiegiem app.py - store czyta FARAD_DATA_DIR przy imporcie
+    data_dir = tempfile.mkdtemp(prefix="farad_rerun_")
+    os.environ.setdefault("FARAD_DATA_DIR", data_dir)
+    try:
+        for rows in args.rows:
+            result = measure(rows, args.repeat)
+            print(f"{rows:>6} wierszy: " + ", ".join(f"{k} {v * 1000:.0f} ms" for k, v in result.items()))
+    finally:
+        shutil.rmtree(data_dir, ignore_errors=True)
+
+if __name__ == "__main__":
+    main()
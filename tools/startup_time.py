@@ -0,0 +1,76 @@
+# --- POMIAR ZIMNEGO STARTU ---
+# Użycie: python tools/startup_time.py [--repeat 3] [--budget 3.0] [-o startup.json]
+# Każdy pomiar w świeżym interpreterze (jak nowy kontener):
+#   import_s       - import modułów aplikacji (app.py bez uruchamiania main)
+#   first_render_s - pierwszy przebieg app.py (AppTest), łącznie z importami
+# Kod wyjścia 1, gdy mediana first_render_s przekracza --budget.
+# Archiwum (FARAD_DATA_DIR) tymczasowe, usuwane po pomiarze - chyba że ustawione w środowisku.
+import argparse
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_BUDGET = 3.0
+
+PROBE = r"""
+import json, os, sys, time
+sys.path.insert(0, {repo!r})
+start = time.perf_counter()
+import streamlit
+streamlit_s = time.perf_counter() - start
+if {mode!r} == "import":
+    start = time.perf_counter()
+    import app
+    elapsed = time.perf_counter() - start
+else:
+    from streamlit.testing.v1 import AppTest
+    at = AppTest.from_file(os.path.join({repo!r}, "app.py"), default_timeout=120)
+    start = time.perf_counter()
+    at.run()
+    elapsed = time.perf_counter() - start
+    assert not at.exception, [e.value for e in at.exception]
+print(json.dumps({{"elapsed": elapsed, "streamlit_s": streamlit_s,
+                  "pdf_stack_loaded": "reportlab.platypus" in sys.modules, "modules": len(sys.modules)}}))
+"""
+
+def probe(mode, data_dir):
+    env = {"FARAD_DATA_DIR": data_dir, **os.environ}
+    proc = subprocess.run([sys.executable, "-c", PROBE.format(repo=REPO, mode=mode)], capture_output=True, text=True, cwd=REPO, env=env)
+    if proc.returncode != 0:
+        raise RuntimeError(proc.stderr.strip().splitlines()[-1])
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Czas zimnego startu aplikacji")
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--budget', type=float, default=DEFAULT_BUDGET, help="limit first_render_s (s)")
+    parser.add_argument('-o', '--output', help="zapis wyniku JSON")
+    args = parser.parse_args(argv)
+
+    data_dir = tempfile.mkdtemp(prefix="farad_startup_")
+    try:
+        imports = [probe("import", data_dir) for _ in range(args.repeat)]
+        renders = [probe("render", data_dir) for _ in range(args.repeat)]
+    finally:
+        shutil.rmtree(data_dir, ignore_errors=True)
+    result = {
+        'import_s': round(statistics.median(r['elapsed'] for r in imports), 3),
+        'streamlit_import_s': round(statistics.median(r['streamlit_s'] for r in imports), 3),
+        'first_render_s': round(statistics.median(r['elapsed'] for r in renders), 3),
+        'pdf_stack_loaded': renders[-1]['pdf_stack_loaded'],
+        'modules': renders[-1]['modules'],
+        'budget_s': args.budget,
+    }
+    print(json.dumps(result, ensure_ascii=False))
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as fh:
+            json.dump(result, fh, ensure_ascii=False, indent=1)
+    return 1 if result['first_render_s'] > args.budget else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,101 @@
+# --- PORÓWNANIE Z POPRZEDNIM BADANIEM (badania okresowe) ---
+# Odczyty obwodów bieżącego protokołu zestawiane z ostatnim wcześniejszym protokołem tego
+# samego obiektu z archiwum (store.previous_protocols / store.readings). Obwody łączone są
+# po rozdzielnicy i nazwie (bez rozróżniania wielkości liter i spacji na końcach); nazwa
+# powtórzona w jednej rozdzielnicy - według kolejności wystąpienia. Wszystko kolumnowo.
+import numpy as np
+import pandas as pd
+
+from compliance import to_numeric
+from schema import TEXT
+
+TREND_COLUMNS = ['R_ISO', 'Zs_pom', 'RCD_t']
+KEY_COLUMNS = ['tabela', 'klucz', 'wystapienie']
+
+# Pogorszenie względem poprzedniego badania (zmiana względna)
+R_ISO_DROP = 0.5    # rezystancja izolacji spadła o ponad połowę
+ZS_RISE = 0.2       # impedancja pętli wzrosła o ponad 20%
+RCD_T_RISE = 0.5    # czas zadziałania RCD wydłużył się o ponad 50%
+
+STATUS_WORSE = "POGORSZENIE"
+STATUS_SAME = "BEZ POGORSZENIA"
+STATUS_NEW = "NOWY"
+STATUS_GONE = "BRAK"
+
+TREND_PDF_ROWS = 500   # obwodów z pogorszeniem w sekcji PDF (reszta tylko w podsumowaniu)
+
+def readings(tables):
+    # {tabela: DataFrame} -> jedna tabela odczytów (tabela, Nazwa_Obwodu, R_ISO, Zs_pom, RCD_t)
+    frames = [df[['Nazwa_Obwodu', *TREND_COLUMNS]].assign(tabela=str(name)) for name, df in tables.items()]
+    if not frames:
+        return pd.DataFrame(columns=['tabela', 'Nazwa_Obwodu', *TREND_COLUMNS])
+    return pd.concat(frames, ignore_index=True)
+
+def _keyed(df):
+    # Klucze jako napisy Arrow - strip/lower i łączenie bez obiektów Pythona
+    df = df.reset_index(drop=True)
+    name = df['Nazwa_Obwodu'].astype(TEXT).fillna('')
+    out = pd.DataFrame({
+        'tabela': df['tabela'].astype(TEXT),
+        'klucz': name.str.strip().str.lower(),
+        'Nazwa_Obwodu': name,
+        **{col: to_numeric(df[col]) for col in TREND_COLUMNS},
+        'poz': np.arange(len(df)),
+    })
+    out['wystapienie'] = out.groupby(['tabela', 'klucz'], sort=False).cumcount()
+    return out
+
+def compare(current, previous):
+    # current/previous: tabele odczytów (readings / store.readings). Wynik w kolejności
+    # bieżącego protokołu, obwody nieobecne w nim - na końcu.
+    cur = _keyed(current)
+    prev = _keyed(previous)
+    merged = cur.merge(prev, on=KEY_COLUMNS, how='outer', suffixes=('', '_prev'), indicator=True)
+    merged = merged.sort_values(['poz', 'poz_prev'], na_position='last', kind='stable').reset_index(drop=True)
+
+    out = pd.DataFrame({
+        'tabela': merged['tabela'],
+        'Nazwa_Obwodu': merged['Nazwa_Obwodu'].fillna(merged['Nazwa_Obwodu_prev']),
+    })
+    for col in TREND_COLUMNS:
+        out[f'{col}_prev'] = merged[f'{col}_prev']
+        out[col] = merged[col]
+        out[f'd_{col}'] = merged[col] - merged[f'{col}_prev']
+
+    # Porównania z NaN dają False - brak odczytu nie jest pogorszeniem
+    r_iso, r_iso_prev = merged['R_ISO'].to_numpy(), merged['R_ISO_prev'].to_numpy()
+    zs, zs_prev = merged['Zs_pom'].to_numpy(), merged['Zs_pom_prev'].to_numpy()
+    rcd, rcd_prev = merged['RCD_t'].to_numpy(), merged['RCD_t_prev'].to_numpy()
+    out['R_ISO_spadek'] = r_iso < r_iso_prev * (1 - R_ISO_DROP)
+    out['Zs_wzrost'] = (zs_prev > 0) & (zs > zs_prev * (1 + ZS_RISE))
+    out['RCD_wzrost'] = (rcd_prev > 0) & (rcd > rcd_prev * (1 + RCD_T_RISE))
+    worse = out['R_ISO_spadek'] | out['Zs_wzrost'] | out['RCD_wzrost']
+
+    side = merged['_merge'].to_numpy()
+    out['Status'] = np.select(
+        [side == 'right_only', side == 'left_only', worse.to_numpy()],
+        [STATUS_GONE, STATUS_NEW, STATUS_WORSE], default=STATUS_SAME)
+    return out
+
+def summary(result):
+    counts = result['Status'].value_counts()
+    return {
+        'porownano': int(((result['Status'] == STATUS_WORSE) | (result['Status'] == STATUS_SAME)).sum()),
+        **{status: int(counts.get(status, 0)) for status in (STATUS_WORSE, STATUS_SAME, STATUS_NEW, STATUS_GONE)},
+    }
+
+def trend_payload(result, previous, limit=TREND_PDF_ROWS):
+    # Sekcja PDF jako zwykły słownik (data['trend']): poprzedni protokół, podsumowanie
+    # i obwody z pogorszeniem - wchodzi do payload_hash i przechodzi do procesów puli
+    worse = result[result['Status'] == STATUS_WORSE].head(limit)
+    cols = ['tabela', 'Nazwa_Obwodu'] + [c for col in TREND_COLUMNS for c in (f'{col}_prev', col)]
+    rows = worse[cols].astype(object).where(worse[cols].notna(), None).to_dict('records')
+    for row in rows:
+        for key, value in row.items():
+            if isinstance(value, float):
+                row[key] = round(value, 3)
+    return {
+        'previous': {'nr_protokolu': str(previous.get('nr_protokolu') or ''), 'data': str(previous.get('data') or '')},
+        'summary': summary(result),
+        'rows': rows,
+    }